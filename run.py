@@ -9,42 +9,59 @@
 
 Script Runner Module
 
-This module provides functionality to sequentially execute Python scripts while handling errors
+This module provides functionality to sequentially execute the project scripts while handling errors
 and providing execution status feedback. It specifically manages the execution of two scripts:
 1. access_gsheet_and_save_data.py
-2. convert-sheets-to-markdown.py
+2. convert_sheets_to_markdown.py
 
-The scripts are executed in order, and the process stops if the first script fails.
+Both scripts are imported and their main() functions are called in the same interpreter, so the
+heavy Google libraries are only loaded once. The second script is imported in a background thread
+while the first one runs, so its import time overlaps the first script's network I/O. The scripts
+are executed in order, and the process stops if the first script fails.
 """
 
+import importlib
 import os
-import subprocess
 import sys
+import threading
 
 
-def run_script(script_path):
+def preload_script(module_name):
     """
-    Execute a Python script and verify its execution status.
+    Import a script module ahead of time, ignoring errors.
+
+    Import failures are reported later by run_script(), when the module is imported again.
 
     Args:
-        script_path (str): The path to the Python script to be executed.
+        module_name (str): The dotted name of the script module to import.
+    """
+    try:
+        importlib.import_module(module_name)
+    except Exception:
+        pass
+
+
+def run_script(module_name):
+    """
+    Import a script module and run its main() function, verifying its execution status.
+
+    Args:
+        module_name (str): The dotted name of the script module to be executed.
 
     Returns:
-        bool: True if the script executed successfully (return code 0),
+        bool: True if the script executed successfully,
               False if there was an error during execution.
-
-    Raises:
-        subprocess.CalledProcessError: If the script execution fails.
     """
-    print(f"\nExecutando {os.path.basename(script_path)}...")
+    script_name = f"{module_name.rsplit('.', 1)[-1]}.py"
+    print(f"\nExecutando {script_name}...")
     try:
-        result = subprocess.run([sys.executable, script_path], check=True)
-        if result.returncode == 0:
-            print(f"✓ {os.path.basename(script_path)} executado com sucesso!")
-            return True
-        return False
-    except subprocess.CalledProcessError as e:
-        print(f"✗ Erro ao executar {os.path.basename(script_path)}: {e}")
+        module = importlib.import_module(module_name)
+        if module.main() is False:
+            return False
+        print(f"✓ {script_name} executado com sucesso!")
+        return True
+    except (Exception, SystemExit) as e:
+        print(f"✗ Erro ao executar {script_name}: {e}")
         return False
 
 
@@ -53,10 +70,11 @@ def main():
     Main function that orchestrates the script execution process.
 
     This function:
-    1. Defines the paths for the required scripts
+    1. Defines the modules for the required scripts
     2. Verifies that all scripts exist
-    3. Executes the scripts in sequence
-    4. Handles execution failures by terminating the process if needed
+    3. Preloads the second script while the first one runs
+    4. Executes the scripts in sequence
+    5. Handles execution failures by terminating the process if needed
 
     Returns:
         None
@@ -64,15 +82,22 @@ def main():
     Exits:
         1: If any script file is not found or if the first script fails
     """
-    script1 = os.path.join("scripts", "access_gsheet_and_save_data.py")
-    script2 = os.path.join("scripts", "convert-sheets-to-markdown.py")
+    script1 = "scripts.access_gsheet_and_save_data"
+    script2 = "scripts.convert_sheets_to_markdown"
 
     for script in [script1, script2]:
-        if not os.path.exists(script):
-            print(f"Erro: O arquivo {script} não foi encontrado.")
+        script_path = os.path.join(*script.split(".")) + ".py"
+        if not os.path.exists(script_path):
+            print(f"Erro: O arquivo {script_path} não foi encontrado.")
             sys.exit(1)
 
+    # Only the converter's module import and library initialization are overlapped with
+    # the first script; its main(), which reads json/sheet_info.json, runs after it
+    preloader = threading.Thread(target=preload_script, args=(script2,), daemon=True)
+    preloader.start()
+
     if run_script(script1):
+        preloader.join()
         run_script(script2)
     else:
         print("\nProcesso interrompido devido a erro no primeiro script.")
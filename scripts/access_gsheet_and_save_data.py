@@ -11,19 +11,35 @@ Google Sheets Access Module
 
 This module provides functionality to authenticate with Google Sheets API and extract information
 from a specified spreadsheet. It handles OAuth2 authentication, manages credentials, and allows
-users to select and save information about specific worksheets.
+users to select and save information about specific worksheets. The worksheet can be chosen
+interactively or passed with --sheet-index/--sheet-title (or SHEET_INDEX/SHEET_TITLE) for
+non-interactive runs.
 """
 
-import gspread
+import argparse
+import functools
+import hashlib
 import json
 import os
-import pickle
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from dotenv import load_dotenv
 
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(obj):
+        return json.dumps(obj, indent=2).encode()
+
 load_dotenv()
 
 SCOPES = [
@@ -31,125 +47,630 @@ SCOPES = [
     "https://www.googleapis.com/auth/drive",
 ]
 
+_GOOGLE_ENV_VARS = (
+    ("client_id", "GOOGLE_CLIENT_ID"),
+    ("project_id", "GOOGLE_PROJECT_ID"),
+    ("auth_uri", "GOOGLE_AUTH_URI"),
+    ("token_uri", "GOOGLE_TOKEN_URI"),
+    ("auth_provider_x509_cert_url", "GOOGLE_AUTH_PROVIDER_CERT_URL"),
+    ("client_secret", "GOOGLE_CLIENT_SECRET"),
+)
+
+# OAuth client settings read once at import, keyed by their client_config name
+_GOOGLE_CFG = {key: os.environ.get(env_var) for key, env_var in _GOOGLE_ENV_VARS}
+
+MAX_WORKERS = 8
+# Retries for rate-limited (429) and server (5xx) errors, with exponential backoff
+NUM_RETRIES = 5
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+HTTP_POOL_SIZE = 16
+# Socket timeout, in seconds, of the Google API requests
+HTTP_TIMEOUT = 30
+SHEETS_API_URL = "https://sheets.googleapis.com/v4/spreadsheets"
+
+TOKEN_DB_PATH = os.path.join("json", "tokens.sqlite")
+# Account the stored token belongs to, allows keeping tokens for several accounts
+TOKEN_KEY = os.getenv("GOOGLE_ACCOUNT", "default")
+
+_CREDS = None
+_TOKEN_DB = None
+
+
+# fdatasync is not available on every platform (e.g. macOS and Windows)
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
+
+def sync_file(f):
+    """
+    Flush a file object and force its data to disk.
+
+    fdatasync skips the metadata-only flush of fsync where the platform provides it.
+
+    Args:
+        f (file): Open file object to sync.
+    """
+    f.flush()
+    _fdatasync(f.fileno())
+
+
+def write_atomic(path, data):
+    """
+    Write bytes to a file atomically.
+
+    The data is written to a temporary file next to the target, synced to disk and then
+    moved into place with os.replace(), so neither an interrupted write nor a system
+    crash leaves a truncated file behind. The temporary name includes the process id so
+    concurrent runs do not write to the same file.
+
+    Args:
+        path (str): Destination file path.
+        data (bytes): Content to write.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        sync_file(f)
+    os.replace(tmp_path, path)
+
+
+def write_lines_atomic(path, lines, buffering=1 << 20):
+    """
+    Write text lines to a file atomically as UTF-8.
+
+    The lines are streamed through a large write buffer into a temporary file, so the
+    full text is never built in memory, and the file is then moved into place with
+    os.replace() like write_atomic().
+
+    Args:
+        path (str): Destination file path.
+        lines (iterable): Strings to write, consumed once.
+        buffering (int, optional): Write buffer size in bytes. Defaults to 1 MiB.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8", buffering=buffering) as f:
+        f.writelines(lines)
+        sync_file(f)
+    os.replace(tmp_path, path)
+
 
-def authenticate_google_sheets():
+def _get_token_db():
     """
-    Authenticate with Google Sheets using OAuth2 credentials from environment variables.
+    Return the SQLite token database connection, opening it on first use.
+
+    The database runs in WAL mode so concurrent readers do not block the writer.
+
+    Returns:
+        sqlite3.Connection: The shared token database connection.
+    """
+    global _TOKEN_DB
+    if _TOKEN_DB is None:
+        import sqlite3
+
+        os.makedirs(os.path.dirname(TOKEN_DB_PATH), exist_ok=True)
+        _TOKEN_DB = sqlite3.connect(TOKEN_DB_PATH, check_same_thread=False)
+        _TOKEN_DB.execute("PRAGMA journal_mode=WAL")
+        _TOKEN_DB.execute(
+            "CREATE TABLE IF NOT EXISTS tokens "
+            "(key TEXT PRIMARY KEY, creds BLOB, config_hash TEXT, updated REAL)"
+        )
+    return _TOKEN_DB
+
+
+def _client_config_hash():
+    """
+    Hash the OAuth client settings so tokens issued for another client are ignored.
+
+    Returns:
+        str: Hex digest identifying the current client configuration.
+    """
+    config = "|".join(
+        [
+            os.getenv("CREDS_SOURCE", "env"),
+            os.getenv("GOOGLE_CLIENT_SECRETS_FILE", ""),
+            _GOOGLE_CFG["client_id"] or "",
+        ]
+    )
+    return hashlib.sha256(config.encode()).hexdigest()
+
+
+def load_token(key=TOKEN_KEY):
+    """
+    Load the stored authorized-user info for an account.
+
+    Args:
+        key (str): Account key the token was stored under.
+
+    Returns:
+        dict: The authorized-user info, or None if there is no token for the current
+              client configuration.
+    """
+    row = (
+        _get_token_db()
+        .execute("SELECT creds, config_hash FROM tokens WHERE key = ?", (key,))
+        .fetchone()
+    )
+    if row is None or row[1] != _client_config_hash():
+        return None
+    return _json_loads(row[0])
+
+
+def save_token(creds, key=TOKEN_KEY):
+    """
+    Store credentials for an account in the token database.
+
+    Args:
+        creds (Credentials): The credentials to store.
+        key (str): Account key to store the token under.
     """
-    creds = None
-    json_dir = "json"
-    
-    # Create json directory if it doesn't exist
-    if not os.path.exists(json_dir):
-        os.makedirs(json_dir)
-        print(f"Created directory: {json_dir}")
-    
-    token_path = os.path.join(json_dir, "token.pickle")
+    db = _get_token_db()
+    with db:
+        db.execute(
+            "INSERT OR REPLACE INTO tokens (key, creds, config_hash, updated) "
+            "VALUES (?, ?, ?, ?)",
+            (key, creds.to_json().encode(), _client_config_hash(), time.time()),
+        )
 
-    if os.path.exists(token_path):
-        with open(token_path, "rb") as token:
-            creds = pickle.load(token)
+
+def build_client_config():
+    """
+    Build the OAuth2 client configuration used by the installed-app flow.
+
+    CREDS_SOURCE selects where the configuration comes from: "env" (default) uses the
+    GOOGLE_* environment variables read at import time, "file" loads the client secrets JSON
+    downloaded from Google Cloud Console (GOOGLE_CLIENT_SECRETS_FILE, default
+    json/client_secret.json).
+
+    Returns:
+        dict: The client configuration in the "installed" app format.
+
+    Raises:
+        ValueError: If CREDS_SOURCE is invalid or a GOOGLE_* variable is missing.
+    """
+    creds_source = os.getenv("CREDS_SOURCE", "env").lower()
+
+    if creds_source == "file":
+        client_secrets_path = os.getenv(
+            "GOOGLE_CLIENT_SECRETS_FILE", os.path.join("json", "client_secret.json")
+        )
+        with open(client_secrets_path, "rb") as f:
+            return _json_loads(f.read())
+
+    if creds_source != "env":
+        raise ValueError(f"Invalid CREDS_SOURCE '{creds_source}'. Use 'env' or 'file'.")
+
+    missing = [env_var for key, env_var in _GOOGLE_ENV_VARS if not _GOOGLE_CFG[key]]
+    if missing:
+        raise ValueError(
+            f"Missing Google OAuth settings in environment variables: {', '.join(missing)}. "
+            "Check your .env file."
+        )
+
+    return {"installed": {**_GOOGLE_CFG, "redirect_uris": ["http://localhost:8080"]}}
+
+
+def get_cached_credentials():
+    """
+    Return the in-memory credentials if they were already loaded and are still valid.
+
+    Returns:
+        Credentials: The cached credentials, or None if none are available.
+    """
+    if _CREDS and _CREDS.valid:
+        return _CREDS
+    return None
+
+
+def get_credentials():
+    """
+    Return OAuth2 credentials, loading or refreshing them only once per process.
+
+    The credentials are kept in memory after the first call so other scripts running in the
+    same interpreter can reuse them without querying the token database again. The token
+    database is only written after a refresh or a new consent flow. A token that fails to
+    refresh is replaced through a new consent flow.
+
+    Returns:
+        Credentials: Valid Google OAuth2 credentials.
+    """
+    global _CREDS
+    cached = get_cached_credentials()
+    if cached:
+        return cached
+
+    # Heavy Google SDK imports are deferred until credentials are actually needed
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
+    creds = _CREDS
+
+    if creds is None:
+        token_info = load_token()
+        if token_info:
+            creds = Credentials.from_authorized_user_info(token_info, SCOPES)
 
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            # Use environment variables directly
-            client_config = {
-                "installed": {
-                    "client_id": os.getenv("GOOGLE_CLIENT_ID"),
-                    "project_id": os.getenv("GOOGLE_PROJECT_ID"),
-                    "auth_uri": os.getenv("GOOGLE_AUTH_URI"),
-                    "token_uri": os.getenv("GOOGLE_TOKEN_URI"),
-                    "auth_provider_x509_cert_url": os.getenv("GOOGLE_AUTH_PROVIDER_CERT_URL"),
-                    "client_secret": os.getenv("GOOGLE_CLIENT_SECRET"),
-                    "redirect_uris": ["http://localhost:8080"]
-                }
-            }
+            try:
+                creds.refresh(Request(get_requests_session()))
+            except Exception as e:
+                print(f"Error refreshing token: {e}")
+                creds = None
 
+        if not creds or not creds.valid:
+            client_config = build_client_config()
             flow = InstalledAppFlow.from_client_config(client_config, SCOPES)
             print("Starting authentication process...")
             print("Add the following redirect URI in Google Cloud Console:")
             print("http://localhost:8080/")
             creds = flow.run_local_server(port=8080)
 
-            with open(token_path, "wb") as token:
-                pickle.dump(creds, token)
+        save_token(creds)
 
-    client = gspread.authorize(creds)
-    return client
+    _CREDS = creds
+    return creds
 
 
-def list_sheets_and_save_info(spreadsheet_id, output_file):
+@functools.lru_cache(maxsize=1)
+def get_http_adapter():
     """
-    Access a spreadsheet, list its worksheets, and save selected worksheet information to a JSON file.
+    Return the HTTPS adapter shared by every requests session of the process.
+
+    Mounting one adapter on several sessions makes them share its urllib3 connection
+    pools, so token refreshes and API calls to the same Google host reuse keep-alive
+    connections instead of re-doing TLS handshakes. The adapter also retries dropped
+    connections and RETRYABLE_STATUSES responses of idempotent requests, honouring
+    Retry-After, and returns the last response once NUM_RETRIES is exhausted.
+
+    Returns:
+        HTTPAdapter: Adapter pooled for the worker threads.
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retries = Retry(
+        total=NUM_RETRIES,
+        status_forcelist=RETRYABLE_STATUSES,
+        backoff_factor=1,
+        raise_on_status=False,
+    )
+    return HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retries
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def get_requests_session():
+    """
+    Return the shared unauthenticated requests session, used for token refreshes.
+
+    Returns:
+        requests.Session: Session mounted on the shared HTTPS adapter.
+    """
+    import requests
+
+    session = requests.Session()
+    session.mount("https://", get_http_adapter())
+    return session
+
+
+def build_authorized_session(creds):
+    """
+    Create an AuthorizedSession on the shared connection pool.
+
+    The credentials are refreshed through the shared requests session, so the OAuth
+    token endpoint is reached over the same pooled connections.
 
     Args:
-        spreadsheet_id (str): The ID of the Google Spreadsheet to access.
-        output_file (str): Path to the JSON file where worksheet information will be saved.
+        creds (Credentials): Google OAuth2 credentials.
 
     Returns:
-        None
+        AuthorizedSession: Session that signs requests with the credentials.
+    """
+    from google.auth.transport.requests import AuthorizedSession, Request
 
-    Raises:
-        gspread.SpreadsheetNotFound: If the specified spreadsheet ID is invalid or inaccessible.
-        ValueError: If user input is invalid during worksheet selection.
+    session = AuthorizedSession(creds, auth_request=Request(get_requests_session()))
+    session.mount("https://", get_http_adapter())
+    return session
+
+
+@functools.lru_cache(maxsize=1)
+def get_authorized_session():
     """
-    # Create output directory if it doesn't exist
-    output_dir = os.path.dirname(output_file)
-    if output_dir and not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        print(f"Created directory: {output_dir}")
+    Return the shared AuthorizedSession, creating it on first use.
 
-    client = authenticate_google_sheets()
+    The session is thread-safe, so the worker threads listing several spreadsheets
+    send their requests through it concurrently.
 
-    try:
-        spreadsheet = client.open_by_key(spreadsheet_id)
-    except gspread.SpreadsheetNotFound:
-        print(f"Error: Spreadsheet with ID '{spreadsheet_id}' not found.")
-        return
-    except Exception as e:
-        print(f"Error accessing spreadsheet: {e}")
-        return
+    Returns:
+        AuthorizedSession: The pooled session for this process.
+    """
+    return build_authorized_session(get_credentials())
 
-    worksheets = spreadsheet.worksheets()
-    print("\nAvailable worksheets:")
-    for i, sheet in enumerate(worksheets):
-        print(f"{i + 1}. {sheet.title} (ID: {sheet.id})")
+
+def select_worksheet(worksheets, sheet_index=None, sheet_title=None):
+    """
+    Select a worksheet by index or title, prompting the user when neither is given.
+
+    Args:
+        worksheets (list): Worksheet properties dicts with "sheetId" and "title" keys.
+        sheet_index (int, optional): 1-based position of the worksheet to select.
+        sheet_title (str, optional): Title of the worksheet to select.
+
+    Returns:
+        dict: The properties of the selected worksheet.
+
+    Raises:
+        ValueError: If the given index or title does not match any worksheet.
+    """
+    if sheet_title is not None:
+        for sheet in worksheets:
+            if sheet["title"] == sheet_title:
+                return sheet
+        raise ValueError(f"Worksheet with title '{sheet_title}' not found.")
+
+    if sheet_index is not None:
+        if 1 <= sheet_index <= len(worksheets):
+            return worksheets[sheet_index - 1]
+        raise ValueError(
+            f"Worksheet index {sheet_index} is out of range (1-{len(worksheets)})."
+        )
 
     while True:
         try:
             choice = int(input("\nChoose the number of the worksheet to access: "))
             if 1 <= choice <= len(worksheets):
-                selected_sheet = worksheets[choice - 1]
-                break
+                return worksheets[choice - 1]
             else:
                 print("Invalid choice. Please try again.")
         except ValueError:
             print("Invalid input. Please enter a number.")
 
-    sheet_info = {
+
+def fetch_worksheets(spreadsheet_id):
+    """
+    Fetch the properties of every worksheet of a spreadsheet.
+
+    Nothing is printed, so several spreadsheets can be fetched from worker threads.
+
+    Args:
+        spreadsheet_id (str): The ID of the Google Spreadsheet to access.
+
+    Returns:
+        list: Worksheet properties dicts with "sheetId" and "title" keys.
+
+    Raises:
+        requests.HTTPError: If the specified spreadsheet ID is invalid or inaccessible.
+    """
+    response = get_authorized_session().get(
+        f"{SHEETS_API_URL}/{spreadsheet_id}",
+        params={"fields": "sheets.properties(sheetId,title)"},
+        timeout=HTTP_TIMEOUT,
+    )
+    response.raise_for_status()
+    return [sheet["properties"] for sheet in _json_loads(response.content).get("sheets", [])]
+
+
+def print_fetch_error(spreadsheet_id, error):
+    """
+    Report why the worksheets of a spreadsheet could not be fetched.
+
+    Args:
+        spreadsheet_id (str): The ID of the Google Spreadsheet.
+        error (Exception): The error raised by fetch_worksheets().
+    """
+    response = getattr(error, "response", None)
+    if response is not None and response.status_code == 404:
+        print(f"Error: Spreadsheet with ID '{spreadsheet_id}' not found.")
+    else:
+        print(f"Error accessing spreadsheet: {error}")
+
+
+def print_worksheets(worksheets):
+    """
+    Print the numbered list of worksheets the user can choose from.
+
+    Args:
+        worksheets (list): Worksheet properties dicts with "sheetId" and "title" keys.
+    """
+    print("\nAvailable worksheets:")
+    for i, sheet in enumerate(worksheets):
+        print(f"{i + 1}. {sheet['title']} (ID: {sheet['sheetId']})")
+
+
+def build_sheet_info(spreadsheet_id, sheet):
+    """
+    Build the worksheet information saved for the converter.
+
+    Args:
+        spreadsheet_id (str): The ID of the Google Spreadsheet.
+        sheet (dict): Properties of the selected worksheet.
+
+    Returns:
+        dict: The spreadsheet ID with the ID and title of the worksheet.
+    """
+    return {
         "spreadsheet_id": spreadsheet_id,
-        "sheet_id": selected_sheet.id,
-        "sheet_title": selected_sheet.title,
+        "sheet_id": sheet["sheetId"],
+        "sheet_title": sheet["title"],
     }
 
-    with open(output_file, "w") as f:
-        json.dump(sheet_info, f, indent=4)
 
-    print(f"\nWorksheet '{selected_sheet.title}' information saved to '{output_file}'.")
+def list_sheets_and_save_info(spreadsheet_id, output_file, sheet_index=None, sheet_title=None):
+    """
+    Access a spreadsheet, list its worksheets, and save selected worksheet information to a JSON file.
+
+    Args:
+        spreadsheet_id (str): The ID of the Google Spreadsheet to access.
+        output_file (str): Path to the JSON file where worksheet information will be saved.
+        sheet_index (int, optional): 1-based worksheet position, skips the interactive prompt.
+        sheet_title (str, optional): Worksheet title, skips the interactive prompt.
+
+    Returns:
+        bool: True if the information was saved, False if the spreadsheet could not be read.
 
+    Raises:
+        ValueError: If the requested worksheet index or title does not exist.
+    """
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
 
-if __name__ == "__main__":
     try:
-        SPREADSHEET_ID = os.getenv("SPREADSHEET_ID")
-        if not SPREADSHEET_ID:
+        worksheets = fetch_worksheets(spreadsheet_id)
+    except Exception as e:
+        print_fetch_error(spreadsheet_id, e)
+        return False
+
+    print_worksheets(worksheets)
+    selected_sheet = select_worksheet(worksheets, sheet_index, sheet_title)
+
+    write_atomic(output_file, _json_dumps(build_sheet_info(spreadsheet_id, selected_sheet)))
+
+    print(f"\nWorksheet '{selected_sheet['title']}' information saved to '{output_file}'.")
+    return True
+
+
+def parse_args(argv=None):
+    """
+    Parse the command line options used to select a worksheet without prompting.
+
+    The SHEET_INDEX and SHEET_TITLE environment variables are used as defaults. Unknown
+    options are ignored so the converter's options can share the run.py command line.
+
+    Args:
+        argv (list, optional): Arguments to parse. Defaults to sys.argv[1:].
+
+    Returns:
+        argparse.Namespace: The parsed options with sheet_index and sheet_title.
+    """
+    parser = argparse.ArgumentParser(
+        description="Select a worksheet and save its information to json/sheet_info.json."
+    )
+    parser.add_argument(
+        "--sheet-index",
+        type=int,
+        # A string default is converted by type=int too, so a bad value is a usage error
+        default=os.getenv("SHEET_INDEX") or None,
+        help="1-based position of the worksheet to select (env: SHEET_INDEX)",
+    )
+    parser.add_argument(
+        "--sheet-title",
+        default=os.getenv("SHEET_TITLE") or None,
+        help="title of the worksheet to select (env: SHEET_TITLE)",
+    )
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+def get_spreadsheet_ids():
+    """
+    Read the spreadsheet IDs to process from the environment.
+
+    SPREADSHEET_IDS (comma-separated) takes precedence over SPREADSHEET_ID.
+
+    Returns:
+        list: The spreadsheet IDs, empty if none are configured.
+    """
+    spreadsheet_ids = os.getenv("SPREADSHEET_IDS") or os.getenv("SPREADSHEET_ID") or ""
+    return [s.strip() for s in spreadsheet_ids.split(",") if s.strip()]
+
+
+def save_info_for_spreadsheets(spreadsheet_ids, output_file, sheet_index=None, sheet_title=None):
+    """
+    Save worksheet information for several spreadsheets to one JSON file.
+
+    The worksheets are fetched concurrently in a thread pool sharing the same session,
+    as the requests are I/O-bound. The results are then printed and selected from this
+    thread in the order of spreadsheet_ids, so the output of the workers never
+    interleaves and, without sheet_index or sheet_title, the user is prompted for the
+    worksheet of each spreadsheet in turn. The file holds a "spreadsheets" list with one entry per spreadsheet,
+    which the converter processes in turn. Nothing is written if any spreadsheet fails.
+
+    Args:
+        spreadsheet_ids (list): The IDs of the Google Spreadsheets to access.
+        output_file (str): Path to the JSON file where worksheet information will be saved.
+        sheet_index (int, optional): 1-based worksheet position to select in each spreadsheet.
+        sheet_title (str, optional): Worksheet title to select in each spreadsheet.
+
+    Returns:
+        bool: True if every spreadsheet was saved, False if any of them failed.
+
+    Raises:
+        ValueError: If the worksheet does not exist in one of the spreadsheets.
+    """
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    # Load credentials once before the workers start so they share one session
+    get_authorized_session()
+
+    def fetch_one(spreadsheet_id):
+        try:
+            return fetch_worksheets(spreadsheet_id), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(spreadsheet_ids))) as executor:
+        results = list(executor.map(fetch_one, spreadsheet_ids))
+
+    spreadsheets = []
+    for spreadsheet_id, (worksheets, error) in zip(spreadsheet_ids, results):
+        if error is not None:
+            print_fetch_error(spreadsheet_id, error)
+            continue
+        print(f"\nSpreadsheet '{spreadsheet_id}':")
+        print_worksheets(worksheets)
+        selected_sheet = select_worksheet(worksheets, sheet_index, sheet_title)
+        spreadsheets.append(build_sheet_info(spreadsheet_id, selected_sheet))
+
+    if len(spreadsheets) < len(spreadsheet_ids):
+        return False
+
+    write_atomic(output_file, _json_dumps({"spreadsheets": spreadsheets}))
+
+    print(f"\nInformation of {len(spreadsheets)} worksheets saved to '{output_file}'.")
+    return True
+
+
+def main(argv=None):
+    """
+    Entry point that reads the spreadsheet IDs from the environment and saves the
+    selected worksheet information to json/sheet_info.json.
+
+    When SPREADSHEET_IDS lists more than one spreadsheet, they are fetched concurrently
+    and all of them are saved to json/sheet_info.json as a "spreadsheets" list.
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        bool: True if the worksheet information was saved, False if an error occurred.
+    """
+    args = parse_args(argv)
+
+    try:
+        spreadsheet_ids = get_spreadsheet_ids()
+        if not spreadsheet_ids:
             raise ValueError(
                 "SPREADSHEET_ID not found in environment variables. Check your .env file."
             )
 
-        OUTPUT_FILE = os.path.join("json", "sheet_info.json")
+        output_file = os.path.join("json", "sheet_info.json")
+
+        if len(spreadsheet_ids) > 1:
+            return save_info_for_spreadsheets(
+                spreadsheet_ids, output_file, args.sheet_index, args.sheet_title
+            )
 
-        list_sheets_and_save_info(SPREADSHEET_ID, OUTPUT_FILE)
+        return list_sheets_and_save_info(
+            spreadsheet_ids[0], output_file, args.sheet_index, args.sheet_title
+        )
     except Exception as e:
         print(f"Error: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    main()
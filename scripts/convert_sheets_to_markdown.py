@@ -0,0 +1,2307 @@
+"""
+            _                      
+   _____   (_)  _____  _____  ____ 
+  / ___/  / /  / ___/ / ___/ / __ \
+ / /     / /  / /__  / /__  / /_/ /
+/_/     /_/   \___/  \___/  \____/ 
+                                   
+© r1cco.com
+                            
+Google Sheets to Markdown Converter Module
+
+This module provides functionality to convert Google Sheets data into formatted Markdown tables.
+It handles complex spreadsheet elements and uses AI assistance for optimal formatting.
+
+Key Features:
+1. Google Sheets API integration with secure authentication
+2. Intelligent data formatting using Gemini AI
+3. Special elements handling (formulas, dropdowns, checkboxes)
+4. Real-time progress tracking with visual feedback
+5. AI-assisted file naming
+6. Markdown table generation with proper alignment and formatting
+7. Optional local rendering of a plain Markdown table without any Gemini request
+
+The module preserves the original sheet layout while creating clean, readable markdown output
+suitable for documentation and content management systems.
+"""
+
+import argparse
+import asyncio
+import collections
+import functools
+import hashlib
+import io
+import itertools
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import unicodedata
+
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(obj):
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Imported as scripts.convert_sheets_to_markdown by run.py, or run directly as a script
+if __package__:
+    from scripts import access_gsheet_and_save_data
+else:
+    import access_gsheet_and_save_data
+
+# Importing access_gsheet_and_save_data has already loaded the .env file
+os.environ["GRPC_PYTHON_LOG_LEVEL"] = "error"
+
+CACHE_DIR = "cache"
+# Bumped whenever the shape of the cached sheet data changes, so old caches are ignored
+CACHE_VERSION = 2
+
+SHEETS_API_URL = "https://sheets.googleapis.com/v4/spreadsheets"
+VALIDATION_FIELDS = (
+    "sheets(properties(title),"
+    "data(rowData(values(dataValidation(condition(values(userEnteredValue)))))))"
+)
+
+# Seconds between simulated progress updates
+SIMULATION_TICK = 1.0
+# Time constant, in seconds, of the simulated progress easing curve
+SIMULATION_TAU = 5.0
+# Minimum seconds between two redraws of the same progress bar
+REDRAW_INTERVAL = 0.1
+
+_MODELS = {}
+# Settings key of every model in _MODELS, by id(model), used in response cache keys
+_MODEL_KEYS = {}
+
+# Names of the Candidate.FinishReason values, for responses that report a bare integer
+_FINISH_REASON_NAMES = {1: "STOP", 2: "MAX_TOKENS", 3: "SAFETY", 4: "RECITATION"}
+
+# Gemini responses are cached by a hash of the model settings and the prompt
+GEMINI_CACHE_DIR = os.path.join(CACHE_DIR, "gemini")
+GEMINI_CACHE_TTL = 7 * 86400
+
+# Data rows sent to Gemini per formatting request, and how many requests run at once.
+# Chunks are also cut at FORMAT_CHUNK_CHARS so their table fits FORMAT_MAX_OUTPUT_TOKENS.
+FORMAT_CHUNK_ROWS = 200
+GEMINI_MAX_CONCURRENCY = 4
+# Retries of a transient Gemini failure, waiting GEMINI_BACKOFF_BASE * 2**n seconds
+GEMINI_MAX_RETRIES = 5
+GEMINI_BACKOFF_BASE = 1.0
+# Sheets API statuses retried with the same backoff, at most NUM_RETRIES times
+RETRYABLE_STATUSES = access_gsheet_and_save_data.RETRYABLE_STATUSES
+# Upper bound of a single backoff sleep, including one asked for with Retry-After
+RETRY_MAX_DELAY = 30.0
+# JSON Lines file where Gemini requests that still failed after the retries are recorded
+FAILED_REQUESTS_LOG = os.path.join(CACHE_DIR, "failed_requests.jsonl")
+
+# Hex digits of the spreadsheet ID and worksheet hash appended to an output name that
+# another worksheet of the same run already uses, so neither file overwrites the other
+OUTPUT_SUFFIX_LENGTH = 8
+# Spreadsheet ID and worksheet title that each output path written or kept belongs to
+_OUTPUT_OWNERS = {}
+
+# Sheets this small are rendered locally even when Gemini formatting is enabled
+LOCAL_RENDER_MAX_ROWS = 50
+LOCAL_RENDER_MAX_CHARS = 5000
+
+# First characters of the lines of a box-drawing table, as FORMAT_SYSTEM_INSTRUCTION asks.
+# Gemini may also answer with a Markdown pipe table like the prompt, whose header ends at
+# a rule line such as "|---|:---:|".
+_BOX_TABLE_CHARS = frozenset("┌│╞├└")
+_PIPE_RULE_PATTERN = re.compile(r"\|(?:\s*:?-+:?\s*\|)*\s*:?-+:?\s*\|?")
+
+# Output token budget per formatting request, estimated from the prompt length
+FORMAT_MIN_OUTPUT_TOKENS = 512
+FORMAT_MAX_OUTPUT_TOKENS = 8192
+# Rough characters per token, and how much larger the table is than its source rows:
+# the box-drawing table pads every cell and adds a separator line after every row
+CHARS_PER_TOKEN = 4
+FORMAT_OUTPUT_EXPANSION = 3.0
+FORMAT_CHUNK_CHARS = int(FORMAT_MAX_OUTPUT_TOKENS * CHARS_PER_TOKEN / FORMAT_OUTPUT_EXPANSION)
+
+FORMAT_SYSTEM_INSTRUCTION = """
+            You are a spreadsheet to Word table converter. Follow these STRICT rules:
+        
+            1. Table structure:
+               ┌────────────────┬──────────────┬─────────────────┐
+               │ **PLACA**      │ **CHASSI**   │ **RENAVAN**     │
+               ╞════════════════╪══════════════╪═════════════════╡
+               │ SUPRIMIDO      │ SUPRIMIDO    │ 9.582.647-3     │
+               ├────────────────┼──────────────┼─────────────────┤
+               │ SUPRIMIDO      │ SUPRIMIDO    │ 8.732.491-5     │
+               ├────────────────┼──────────────┼─────────────────┤
+               │ SUCATA...      │ 9BWSU21FX... │ 7.891.234-6     │
+               └────────────────┴──────────────┴─────────────────┘
+        
+            2. Formatting rules:
+               - Numbers: 8.732.491-5 (thousand separators)
+               - Currency: R$ 176.000,00 (ISO BRL format)
+               - Dates: 22/05/2025 (DD/MM/YYYY)
+               - Checkboxes: ☐ (unchecked) ☒ (checked) centered
+               - Formulas: *SUM(A1:B2)* (italic)
+               - Dropdowns: Value (Option1, Option2)
+               - Repetitive values: Keep exact duplicates
+        
+            3. Prohibited:
+               - Any non-table text
+               - Comments/notes/analysis
+               - Row placeholders (e.g., "...", "rows X-Y")
+               - Data modifications
+               - Column adjustments
+        
+            4. Data requirements:
+               - Include 100% of rows
+               - Maintain exact source order
+               - Preserve all duplicates
+               - Show full values (no truncation)
+               - Keep original capitalization
+        
+            Return ONLY the complete table using box-drawing characters.
+    """
+
+
+class _CharFilter(dict):
+    """
+    str.translate table that keeps alphanumeric characters and replaces the others.
+
+    Each code point is classified with str.isalnum the first time it is seen and then
+    cached in the dict, so the translation itself runs as a single C-level pass.
+    """
+
+    def __init__(self, extra_allowed="", replacement=None):
+        super().__init__()
+        self.extra_allowed = extra_allowed
+        self.replacement = replacement
+
+    def __missing__(self, codepoint):
+        char = chr(codepoint)
+        value = codepoint if char.isalnum() or char in self.extra_allowed else self.replacement
+        self[codepoint] = value
+        return value
+
+
+_FILE_NAME_CHARS = _CharFilter("_.")
+_CACHE_TITLE_CHARS = _CharFilter(replacement="_")
+
+_SLUG_PATTERN = re.compile(r"[^a-z0-9]+")
+
+_TABLE_CELL_ESCAPES = str.maketrans({"|": "\\|", "\n": "<br>", "\r": ""})
+
+_OPTIONS_SEPARATOR = " [options: "
+
+_MARKER_PATTERN = re.compile(r"\[(?:formula|options):")
+_CHECKBOX = {"TRUE": "☒", "VERDADEIRO": "☒", "FALSE": "☐", "FALSO": "☐"}
+# Longer cells cannot be checkbox values, so they skip the upper() call entirely
+_CHECKBOX_MAX_LEN = max(map(len, _CHECKBOX))
+
+
+@functools.lru_cache(maxsize=1)
+def _fast_json_model_class():
+    """
+    Define the orjson-backed response model on first use.
+
+    googleapiclient is imported here rather than at module level so that runs which
+    never reach the Google APIs do not pay for loading it.
+
+    Returns:
+        type: FastJsonModel class
+    """
+    from googleapiclient.model import JsonModel
+
+    class FastJsonModel(JsonModel):
+        """
+        Google API client response model that parses JSON with orjson when available.
+
+        The Sheets API responses can be several megabytes, and the default model decodes
+        them with the pure-Python stdlib json module.
+        """
+
+        def deserialize(self, content):
+            body = _json_loads(content)
+            if self._data_wrapper and "data" in body:
+                body = body["data"]
+            return body
+
+    return FastJsonModel
+
+
+@functools.lru_cache(maxsize=8)
+def build_service(service_name, version, http):
+    """
+    Build a Google API service that decodes responses with FastJsonModel.
+
+    Services are memoized per HTTP client, so repeated runs in the same process with the
+    same credentials reuse the built service instead of parsing the discovery document
+    again.
+
+    Args:
+        service_name (str): API name, e.g. "sheets" or "drive"
+        version (str): API version
+        http (AuthorizedHttp): Shared authorized HTTP client
+
+    Returns:
+        Resource: Google API service object
+    """
+    from googleapiclient.discovery import build
+
+    return build(
+        service_name,
+        version,
+        http=http,
+        model=_fast_json_model_class()(),
+        cache_discovery=False,
+        static_discovery=True,
+    )
+
+
+class ProgressBar:
+    """
+    A console-based progress bar utility for operation tracking.
+
+    This class provides both deterministic and simulated progress tracking with
+    support for multi-step operations and background progress simulation. The
+    simulation runs as an asyncio task on the caller's event loop, so no extra
+    threads compete with the real API work. When stdout is not a terminal only the
+    step headers and the completed bars are written, and nothing is simulated.
+
+    Attributes:
+        total_width (int): Visual width of the progress bar in characters
+        current_step (str): Description of the current operation
+        progress (float): Current completion percentage
+        _stop_event (asyncio.Event): Signals the simulated progress task to stop
+        _task (asyncio.Task): Background task running the progress simulation
+        _step_printed (bool): Track if step description has been displayed
+        _last_draw (float): Monotonic time of the last bar redraw
+        _last_quantum (int): Last drawn progress in tenths of a percent
+        _bars (tuple): Bar strings for every filled width from 0 to total_width
+        _lock (threading.Lock): Serializes updates, which authentication sends from a
+            worker thread while the simulation runs on the event loop
+        _tty (bool): Whether stdout is a terminal that can redraw the bar in place
+    """
+
+    def __init__(self, total_width=80):
+        """
+        Initialize the progress bar with specified width.
+
+        Args:
+            total_width (int): Width of the progress bar in console characters
+        """
+        self.total_width = total_width
+        self.current_step = ""
+        self.progress = 0
+        self._stop_event = None
+        self._task = None
+        self._step_printed = False
+        self._last_draw = 0.0
+        self._last_quantum = -1
+        self._bars = tuple(
+            "#" * filled + "-" * (total_width - filled) for filled in range(total_width + 1)
+        )
+        self._lock = threading.Lock()
+        self._tty = sys.stdout.isatty()
+
+    def update(self, step, progress=None):
+        """
+        Update the progress bar state and display.
+
+        Redraws are limited to one every REDRAW_INTERVAL seconds, except for the first
+        and the final (100%) draw of a step. The bar is derived from the progress
+        quantized to the displayed 0.1%, and nothing is formatted or written while that
+        quantum is unchanged. Each redraw is a single write followed by one flush. A step
+        left unfinished is completed in place when the next one starts.
+
+        Args:
+            step (str): Description of the current operation step
+            progress (float, optional): Completion percentage (0-100)
+        """
+        with self._lock:
+            if step != self.current_step:
+                if self.current_step and self.progress < 100:
+                    self._finish_step()
+                sys.stdout.write(f"\n==> {step}\n")
+                self.current_step = step
+                self.progress = 0
+                self._step_printed = True
+                self._last_draw = 0.0
+                self._last_quantum = -1
+
+            if progress is None:
+                return
+            self.progress = min(100, max(0, progress))
+            if self.progress == 100:
+                self._finish_step()
+                return
+
+            if not self._tty:
+                return
+            quantum = round(self.progress * 10)
+            now = time.monotonic()
+            if quantum == self._last_quantum or now - self._last_draw < REDRAW_INTERVAL:
+                return
+            self._last_draw = now
+            self._last_quantum = quantum
+            self._draw(quantum)
+
+    def _finish_step(self):
+        """
+        Draw the completed bar of the current step and stop its simulated progress.
+        """
+        self.progress = 100
+        if self._last_quantum != 1000:
+            self._last_quantum = 1000
+            self._draw(1000, "\n")
+        if self._stop_event:
+            self._stop_event.set()
+
+    def _draw(self, quantum, end=""):
+        """
+        Write one frame of the bar.
+
+        Args:
+            quantum (int): Progress in tenths of a percent
+            end (str, optional): Text written after the frame
+        """
+        bar = self._bars[self.total_width * quantum // 1000]
+        sys.stdout.write(f"\r{bar} {quantum / 10:.1f}%{end}")
+        sys.stdout.flush()
+
+    async def simulate_progress(self, step, start_from=0, until=80):
+        """
+        Start simulated progress tracking in the background.
+
+        The simulated progress eases towards the target percentage with
+        start_from + (until - start_from) * (1 - exp(-elapsed / SIMULATION_TAU)).
+
+        Args:
+            step (str): Description of the operation step
+            start_from (float): Initial progress percentage
+            until (float): Target progress percentage
+        """
+        await self.wait_for_fake_progress()
+
+        self._stop_event = asyncio.Event()
+        self.update(step, start_from)
+        if not self._tty:
+            return
+        self._task = asyncio.create_task(
+            self._simulate(step, start_from, until, self._stop_event)
+        )
+
+    async def _simulate(self, step, start_from, until, stop_event):
+        """
+        Advance the simulated progress every SIMULATION_TICK seconds until stopped.
+
+        Args:
+            step (str): Description of the operation step
+            start_from (float): Initial progress percentage
+            until (float): Target progress percentage
+            stop_event (asyncio.Event): Event that ends the simulation when set
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=SIMULATION_TICK)
+            except asyncio.TimeoutError:
+                elapsed = loop.time() - started
+                eased = 1 - math.exp(-elapsed / SIMULATION_TAU)
+                self.update(step, start_from + (until - start_from) * eased)
+
+    async def wait_for_fake_progress(self):
+        """Stop any ongoing simulated progress and wait for its task to finish."""
+        if self._task and not self._task.done():
+            self._stop_event.set()
+            await self._task
+
+
+@functools.lru_cache(maxsize=8)
+def _load_sheet_info(path, mtime):
+    """
+    Parse a sheet info JSON file, memoized by path and modification time.
+
+    Passing the mtime as part of the cache key makes edits to the file invalidate the
+    cached result automatically.
+
+    Args:
+        path (str): Path to the sheet info JSON file
+        mtime (float): Modification time of the file, used only as a cache key
+
+    Returns:
+        dict: The parsed sheet info
+    """
+    with open(path, "rb") as f:
+        return _json_loads(f.read())
+
+
+async def get_sheet_metadata(progress=None):
+    """
+    Retrieve spreadsheet metadata from JSON configuration.
+
+    The file describes one spreadsheet, or several under a "spreadsheets" list when
+    access_gsheet_and_save_data processed more than one. Each spreadsheet may list
+    several worksheets under "sheet_titles". Otherwise the single "sheet_title" is used,
+    so "sheet_titles" is always present in the result.
+
+    Args:
+        progress (ProgressBar, optional): Progress tracking instance. Pass None when
+            running concurrently with another step that owns the progress bar.
+
+    Returns:
+        list: Metadata of each spreadsheet, including ID, title and the list of titles
+
+    Raises:
+        FileNotFoundError: If the metadata JSON file is missing
+        json.JSONDecodeError: If the metadata file is invalid
+    """
+    if progress:
+        await progress.simulate_progress("Loading spreadsheet metadata...")
+    json_path = os.path.join("json", "sheet_info.json")
+    data = _load_sheet_info(json_path, os.path.getmtime(json_path))
+    if progress:
+        progress.update("Loading spreadsheet metadata", 100)
+        await progress.wait_for_fake_progress()
+    return [
+        {**info, "sheet_titles": info.get("sheet_titles") or [info["sheet_title"]]}
+        for info in data.get("spreadsheets", [data])
+    ]
+
+
+def _sheet_cache_path(spreadsheet_id, sheet_title, extension=".json"):
+    """
+    Build the cache file path for a worksheet.
+
+    Args:
+        spreadsheet_id (str): Target spreadsheet identifier
+        sheet_title (str): Name of the worksheet
+        extension (str, optional): Suffix of the cache file
+
+    Returns:
+        str: Path of the cache file inside CACHE_DIR
+    """
+    safe_title = sheet_title.translate(_CACHE_TITLE_CHARS)
+    return os.path.join(CACHE_DIR, f"{spreadsheet_id}_{safe_title}{extension}")
+
+
+@functools.lru_cache(maxsize=4)
+def build_authorized_http(creds):
+    """
+    Create one authorized HTTP client to be shared by every Google API service.
+
+    Passing the same client to each build() call keeps a single persistent connection
+    pool instead of opening new HTTPS connections per service. The client is memoized
+    per credentials object.
+
+    Args:
+        creds (Credentials): Valid Google OAuth2 credentials
+
+    Returns:
+        AuthorizedHttp: HTTP client that signs requests with the credentials
+    """
+    import google_auth_httplib2
+    import httplib2
+
+    return google_auth_httplib2.AuthorizedHttp(
+        creds, http=httplib2.Http(timeout=access_gsheet_and_save_data.HTTP_TIMEOUT)
+    )
+
+
+def build_authorized_session(creds):
+    """
+    Create an authorized requests session for responses that are parsed as a stream.
+
+    The session shares the connection pool of access_gsheet_and_save_data, which the
+    token refresh also goes through.
+
+    Args:
+        creds (Credentials): Valid Google OAuth2 credentials
+
+    Returns:
+        AuthorizedSession: Session that signs requests with the credentials
+    """
+    return access_gsheet_and_save_data.build_authorized_session(creds)
+
+
+def get_modified_time(http, spreadsheet_id):
+    """
+    Get the last modification time of a spreadsheet from the Drive API.
+
+    Args:
+        http (AuthorizedHttp): Shared authorized HTTP client
+        spreadsheet_id (str): Target spreadsheet identifier
+
+    Returns:
+        str: RFC 3339 modification timestamp, or None if it cannot be retrieved
+    """
+    try:
+        drive_service = build_service("drive", "v3", http)
+        result = (
+            drive_service.files()
+            .get(fileId=spreadsheet_id, fields="modifiedTime")
+            .execute(num_retries=access_gsheet_and_save_data.NUM_RETRIES)
+        )
+        return result.get("modifiedTime")
+    except Exception as e:
+        print(f"\nError retrieving spreadsheet modification time: {e}")
+        return None
+
+
+def load_cached_sheet_data(spreadsheet_id, sheet_title, modified_time, need_formulas=True):
+    """
+    Load previously fetched sheet data if the spreadsheet has not changed since.
+
+    Args:
+        spreadsheet_id (str): Target spreadsheet identifier
+        sheet_title (str): Name of the worksheet
+        modified_time (str): Current Drive modifiedTime of the spreadsheet
+        need_formulas (bool, optional): Whether the data must include formulas and
+            dropdown options
+
+    Returns:
+        list: The cached formatted sheet data, or None on a cache miss
+    """
+    if not modified_time:
+        return None
+    try:
+        with open(_sheet_cache_path(spreadsheet_id, sheet_title), "rb") as f:
+            cached = _json_loads(f.read())
+    except (OSError, ValueError):
+        return None
+    if (
+        cached.get("version") != CACHE_VERSION
+        or cached.get("modifiedTime") != modified_time
+        or cached.get("formulas", True) != need_formulas
+    ):
+        return None
+    return cached.get("data")
+
+
+def save_cached_sheet_data(
+    spreadsheet_id, sheet_title, modified_time, sheet_data, need_formulas=True
+):
+    """
+    Persist fetched sheet data together with the spreadsheet modification time.
+
+    Args:
+        spreadsheet_id (str): Target spreadsheet identifier
+        sheet_title (str): Name of the worksheet
+        modified_time (str): Drive modifiedTime the data corresponds to
+        sheet_data (list): Formatted sheet data to cache
+        need_formulas (bool, optional): Whether the data includes formulas and
+            dropdown options
+    """
+    if not modified_time:
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    payload = _json_dumps(
+        {
+            "version": CACHE_VERSION,
+            "modifiedTime": modified_time,
+            "formulas": need_formulas,
+            "data": sheet_data,
+        }
+    )
+    access_gsheet_and_save_data.write_atomic(
+        _sheet_cache_path(spreadsheet_id, sheet_title), payload
+    )
+
+
+def load_cached_output(
+    spreadsheet_id, sheet_title, modified_time, need_formulas=True, use_gemini=True
+):
+    """
+    Find the markdown file produced from the spreadsheet at its current version.
+
+    The file must still have the size and modification time recorded when it was
+    written, so a file replaced or edited since then is converted again.
+
+    Args:
+        spreadsheet_id (str): Target spreadsheet identifier
+        sheet_title (str): Name of the worksheet
+        modified_time (str): Current Drive modifiedTime of the spreadsheet
+        need_formulas (bool, optional): Whether the output must include formulas and
+            dropdown options
+        use_gemini (bool, optional): Whether the output must have been formatted by
+            Gemini rather than rendered locally
+
+    Returns:
+        str: Path of the existing output file, or None if the sheet must be converted
+    """
+    if not modified_time:
+        return None
+    try:
+        with open(_sheet_cache_path(spreadsheet_id, sheet_title, ".meta"), "rb") as f:
+            meta = _json_loads(f.read())
+    except (OSError, ValueError):
+        return None
+    output_path = meta.get("output")
+    if (
+        meta.get("modifiedTime") != modified_time
+        or meta.get("formulas", True) != need_formulas
+        or meta.get("gemini", True) != use_gemini
+        or not output_path
+    ):
+        return None
+    try:
+        stat = os.stat(output_path)
+    except OSError:
+        return None
+    if [stat.st_size, stat.st_mtime_ns] != meta.get("fingerprint"):
+        return None
+    return output_path
+
+
+def save_cached_output(
+    spreadsheet_id,
+    sheet_title,
+    modified_time,
+    output_path,
+    need_formulas=True,
+    use_gemini=True,
+):
+    """
+    Record which markdown file was produced from the given spreadsheet version.
+
+    Args:
+        spreadsheet_id (str): Target spreadsheet identifier
+        sheet_title (str): Name of the worksheet
+        modified_time (str): Drive modifiedTime the output corresponds to
+        output_path (str): Path of the written markdown file
+        need_formulas (bool, optional): Whether the output includes formulas and
+            dropdown options
+        use_gemini (bool, optional): Whether the output was formatted by Gemini
+    """
+    if not modified_time:
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    stat = os.stat(output_path)
+    payload = _json_dumps(
+        {
+            "modifiedTime": modified_time,
+            "formulas": need_formulas,
+            "gemini": use_gemini,
+            "output": output_path,
+            "fingerprint": [stat.st_size, stat.st_mtime_ns],
+        }
+    )
+    access_gsheet_and_save_data.write_atomic(
+        _sheet_cache_path(spreadsheet_id, sheet_title, ".meta"), payload
+    )
+
+
+def _retry_delay(attempt, retry_after=None):
+    """
+    Compute the backoff before retrying a failed request.
+
+    Args:
+        attempt (int): Number of the attempt that failed, starting at 0
+        retry_after (str, optional): Retry-After header of the response, in seconds
+
+    Returns:
+        float: Seconds to wait, with jitter, never less than Retry-After and never more
+            than RETRY_MAX_DELAY
+    """
+    delay = GEMINI_BACKOFF_BASE * 2**attempt
+    delay += random.uniform(0, delay / 2)
+    try:
+        delay = max(delay, float(retry_after))
+    except (TypeError, ValueError):
+        pass
+    return min(delay, RETRY_MAX_DELAY)
+
+
+def _call_with_backoff(func, *args):
+    """
+    Call a Sheets API fetch function, retrying transient errors with backoff.
+
+    googleapiclient HttpError is retried when its status is in RETRYABLE_STATUSES, and
+    the socket timeouts and dropped connections of its httplib2 client are always
+    retried, up to NUM_RETRIES times. Requests sent through an AuthorizedSession were
+    already retried by the shared HTTP adapter, for error statuses and connection
+    failures alike, so their requests exceptions are raised as is. Each retry is
+    reported on stderr. This blocks while sleeping, so it is meant to run in a worker
+    thread.
+
+    Args:
+        func (callable): Function that performs the requests
+        *args: Arguments for func
+
+    Returns:
+        The result of func
+
+    Raises:
+        HttpError: If the request fails with a non-transient status or keeps failing
+        requests.RequestException: If a request sent through an AuthorizedSession
+            still fails
+        OSError: If the connection keeps timing out or dropping
+    """
+    import socket
+
+    from googleapiclient.errors import HttpError
+
+    network_errors = (socket.timeout, ConnectionError)
+
+    max_retries = access_gsheet_and_save_data.NUM_RETRIES
+    for attempt in range(max_retries + 1):
+        try:
+            return func(*args)
+        except HttpError as e:
+            status, retry_after = e.resp.status, e.resp.get("retry-after")
+            error = e
+        except network_errors as e:
+            status, retry_after = type(e).__name__, None
+            error = e
+        transient = isinstance(status, str) or status in RETRYABLE_STATUSES
+        if not transient or attempt == max_retries:
+            raise error
+        delay = _retry_delay(attempt, retry_after)
+        print(
+            f"\nSheets API request failed ({status}), retrying in {delay:.1f}s "
+            f"({attempt + 1}/{max_retries})",
+            file=sys.stderr,
+        )
+        time.sleep(delay)
+
+
+def _validation_rows_by_title(sheets):
+    """
+    Extract the data validation rows of each sheet from a field-masked grid response.
+
+    Args:
+        sheets (iterable): Sheet objects with properties.title and grid data
+
+    Returns:
+        dict: Grid cells with data validation rules per row, keyed by sheet title
+    """
+    validation_rows = {}
+    for sheet in sheets:
+        grid = sheet.get("data", [])
+        rows = [row.get("values", []) for row in grid[0].get("rowData", [])] if grid else []
+        validation_rows[sheet.get("properties", {}).get("title")] = rows
+    return validation_rows
+
+
+def _fetch_sheet_ranges(service, spreadsheet_id, sheet_titles, include_validation=True):
+    """
+    Fetch display values, formulas and data validation rules in one batch round trip.
+
+    Instead of downloading the full grid with includeGridData, this issues two
+    values.batchGet requests (formatted values and formulas) and a spreadsheets.get
+    request narrowed with a field mask to the data validation rules, all in a single
+    batch. Every worksheet is listed in the ranges of the same three requests, so the
+    number of subrequests does not grow with the number of tabs.
+
+    Args:
+        service: Google Sheets API service instance
+        spreadsheet_id (str): Target spreadsheet identifier
+        sheet_titles (list): Names of the worksheets to process
+        include_validation (bool, optional): Also fetch the data validation rules.
+            Pass False when they are streamed separately by _stream_validation_rows.
+
+    Returns:
+        dict: (display_rows, formula_rows, validation_rows) aligned 2D lists keyed by
+            sheet title, validation_rows being empty when include_validation is False
+
+    Raises:
+        HttpError: If any of the batched requests fails
+    """
+    responses = {}
+    errors = []
+
+    def collect(request_id, response, exception):
+        if exception is not None:
+            errors.append(exception)
+        else:
+            responses[request_id] = response
+
+    values = service.spreadsheets().values()
+    batch = service.new_batch_http_request(callback=collect)
+    batch.add(
+        values.batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=sheet_titles,
+            valueRenderOption="FORMATTED_VALUE",
+            fields="valueRanges(values)",
+        ),
+        request_id="formatted",
+    )
+    batch.add(
+        values.batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=sheet_titles,
+            valueRenderOption="FORMULA",
+            fields="valueRanges(values)",
+        ),
+        request_id="formula",
+    )
+    if include_validation:
+        batch.add(
+            service.spreadsheets().get(
+                spreadsheetId=spreadsheet_id,
+                ranges=sheet_titles,
+                includeGridData=True,
+                fields=VALIDATION_FIELDS,
+            ),
+            request_id="validation",
+        )
+    batch.execute()
+
+    if errors:
+        raise errors[0]
+
+    # valueRanges come back in the order of the requested ranges
+    display_ranges = responses["formatted"].get("valueRanges", [])
+    formula_ranges = responses["formula"].get("valueRanges", [])
+    validation_rows = _validation_rows_by_title(
+        responses.get("validation", {}).get("sheets", [])
+    )
+
+    ranges = {}
+    for i, sheet_title in enumerate(sheet_titles):
+        display_rows = display_ranges[i].get("values", []) if i < len(display_ranges) else []
+        formula_rows = formula_ranges[i].get("values", []) if i < len(formula_ranges) else []
+        ranges[sheet_title] = (
+            display_rows,
+            formula_rows,
+            validation_rows.get(sheet_title, []),
+        )
+    return ranges
+
+
+def _fetch_display_values(service, spreadsheet_id, sheet_titles):
+    """
+    Fetch only the formatted display values of the worksheets with values.batchGet.
+
+    This is the fast path used when formulas and dropdown options are not needed: a
+    single plain 2D array per worksheet, without the formula render or grid data.
+
+    Args:
+        service: Google Sheets API service instance
+        spreadsheet_id (str): Target spreadsheet identifier
+        sheet_titles (list): Names of the worksheets to process
+
+    Returns:
+        dict: (display_rows, [], []) tuples keyed by sheet title, shaped like the
+            result of _fetch_sheet_ranges
+
+    Raises:
+        HttpError: If the request fails
+    """
+    result = (
+        service.spreadsheets()
+        .values()
+        .batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=sheet_titles,
+            valueRenderOption="FORMATTED_VALUE",
+            fields="valueRanges(values)",
+        )
+        .execute()
+    )
+    value_ranges = result.get("valueRanges", [])
+    return {
+        sheet_title: (
+            value_ranges[i].get("values", []) if i < len(value_ranges) else [],
+            [],
+            [],
+        )
+        for i, sheet_title in enumerate(sheet_titles)
+    }
+
+
+def _stream_validation_rows(session, spreadsheet_id, sheet_titles):
+    """
+    Download the data validation grid over a raw authorized session.
+
+    The grid response is the largest one the converter downloads. With ijson installed
+    it is parsed incrementally from the socket sheet by sheet, which avoids holding the
+    raw body and the decoded objects in memory at once. Otherwise the body is decoded in
+    one go with _json_loads, still skipping the multipart batch response parsing.
+
+    Args:
+        session (AuthorizedSession): Authorized requests session
+        spreadsheet_id (str): Target spreadsheet identifier
+        sheet_titles (list): Names of the worksheets to process
+
+    Returns:
+        dict: Grid cells with data validation rules per row, keyed by sheet title
+
+    Raises:
+        requests.HTTPError: If the Sheets API returns an error status
+    """
+    params = {"ranges": sheet_titles, "includeGridData": "true", "fields": VALIDATION_FIELDS}
+    with session.get(
+        f"{SHEETS_API_URL}/{spreadsheet_id}",
+        params=params,
+        stream=True,
+        timeout=access_gsheet_and_save_data.HTTP_TIMEOUT,
+    ) as response:
+        response.raise_for_status()
+        if ijson is None:
+            return _validation_rows_by_title(_json_loads(response.content).get("sheets", []))
+        response.raw.decode_content = True
+        return _validation_rows_by_title(ijson.items(response.raw, "sheets.item"))
+
+
+def iter_sheet_rows(display_rows, formula_rows, validation_rows, mark=False):
+    """
+    Yield formatted rows from the aligned API arrays, releasing each source row once used.
+
+    Every consumed row is replaced by None in the source lists, so the raw API data is
+    freed progressively instead of being held alongside the formatted copy. The options
+    text of a dropdown is only rebuilt when it differs from the previous cell in the
+    same column.
+
+    Args:
+        display_rows (list): Formatted display values per row
+        formula_rows (list): Formula render values per row
+        validation_rows (list): Grid cells with data validation rules per row
+        mark (bool, optional): Apply the _mark_cell formatting to each cell as it is
+            built, and intern it so repeated values share one string
+
+    Yields:
+        list: Formatted cell values of a non-empty row, including formulas and options
+    """
+    row_count = max(len(display_rows), len(formula_rows), len(validation_rows))
+    # Dropdowns are usually applied to whole columns, so the options text of each column
+    # is kept with the option values it was built from and reused while they match
+    column_options = {}
+
+    for r in range(row_count):
+        display_row = display_rows[r] if r < len(display_rows) else []
+        formula_row = formula_rows[r] if r < len(formula_rows) else []
+        validation_row = validation_rows[r] if r < len(validation_rows) else []
+        for rows in (display_rows, formula_rows, validation_rows):
+            if r < len(rows):
+                rows[r] = None
+
+        if not (display_row or formula_row or validation_row):
+            continue
+
+        row_data = []
+        append = row_data.append
+        for column, (display_value, formula, validation_cell) in enumerate(
+            itertools.zip_longest(display_row, formula_row, validation_row)
+        ):
+            display_value = "" if display_value is None else str(display_value)
+            if not (isinstance(formula, str) and formula.startswith("=")):
+                formula = ""
+            dropdown_options = ()
+            if validation_cell:
+                data_validation = validation_cell.get("dataValidation")
+                if data_validation and "condition" in data_validation:
+                    dropdown_options = data_validation["condition"].get("values", ())
+
+            if not (formula or dropdown_options):
+                cell_value = display_value
+            else:
+                parts = [display_value]
+                if formula:
+                    parts += (" [formula: ", formula, "]")
+                if dropdown_options:
+                    cached = column_options.get(column)
+                    if cached is None or cached[0] != dropdown_options:
+                        options = ", ".join(
+                            opt.get("userEnteredValue", "") for opt in dropdown_options
+                        )
+                        cached = column_options[column] = (dropdown_options, options)
+                    parts += (" [options: ", cached[1], "]")
+                cell_value = "".join(parts)
+
+            append(sys.intern(_mark_cell(cell_value)) if mark else cell_value)
+
+        yield row_data
+
+
+async def get_sheet_data(
+    service,
+    spreadsheet_id,
+    sheet_titles,
+    progress,
+    session=None,
+    mark=True,
+    need_formulas=True,
+):
+    """
+    Fetch and format all data from the specified worksheets of a Google Sheet.
+
+    All worksheets are fetched together in one batch round trip. When a session is
+    given, the data validation grid is downloaded by _stream_validation_rows in
+    parallel with the batched values requests instead of joining the batch. Transient
+    HTTP errors are retried with backoff by _call_with_backoff.
+
+    Args:
+        service: Google Sheets API service instance
+        spreadsheet_id (str): Target spreadsheet identifier
+        sheet_titles (list): Names of the worksheets to process
+        progress (ProgressBar): Progress tracking instance
+        session (AuthorizedSession, optional): Session used to download the validation
+            grid
+        mark (bool, optional): Return the cells already marked with the _mark_cell
+            rules, in the same pass that builds them
+        need_formulas (bool, optional): Include formulas and dropdown options. When
+            False only the display values are fetched, with one values.batchGet call
+
+    Returns:
+        dict: Formatted sheet data including formulas and validation rules, keyed by
+            sheet title
+        None: If an error occurs while retrieving the data
+
+    Raises:
+        Exception: If sheet access or data retrieval fails
+    """
+    try:
+        await progress.simulate_progress("Retrieving spreadsheet data...")
+        if not need_formulas:
+            ranges = await asyncio.to_thread(
+                _call_with_backoff,
+                _fetch_display_values,
+                service,
+                spreadsheet_id,
+                sheet_titles,
+            )
+        elif session is not None:
+            ranges, validation_rows = await asyncio.gather(
+                asyncio.to_thread(
+                    _call_with_backoff,
+                    _fetch_sheet_ranges,
+                    service,
+                    spreadsheet_id,
+                    sheet_titles,
+                    False,
+                ),
+                asyncio.to_thread(
+                    _call_with_backoff,
+                    _stream_validation_rows,
+                    session,
+                    spreadsheet_id,
+                    sheet_titles,
+                ),
+            )
+            for sheet_title, (display_rows, formula_rows, _) in ranges.items():
+                ranges[sheet_title] = (
+                    display_rows,
+                    formula_rows,
+                    validation_rows.get(sheet_title, []),
+                )
+        else:
+            ranges = await asyncio.to_thread(
+                _call_with_backoff, _fetch_sheet_ranges, service, spreadsheet_id, sheet_titles
+            )
+        progress.update("Retrieving spreadsheet data...", 85)
+
+        formatted_data = {
+            sheet_title: list(iter_sheet_rows(*sheet_ranges, mark=mark))
+            for sheet_title, sheet_ranges in ranges.items()
+        }
+
+        progress.update("Retrieving spreadsheet data", 100)
+        await progress.wait_for_fake_progress()
+        return formatted_data
+
+    except Exception as e:
+        print(f"Error accessing spreadsheet: {e}")
+        return None
+
+
+@functools.lru_cache(maxsize=1)
+def _configure_genai():
+    """
+    Import and configure the Gemini client once per process.
+
+    Returns:
+        module: The configured google.generativeai module
+    """
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"), transport="grpc")
+    return genai
+
+
+def _get_generative_model(model_name, generation_config, system_instruction=None):
+    """
+    Return a GenerativeModel, reusing an existing instance with the same settings.
+
+    Args:
+        model_name (str): Gemini model identifier
+        generation_config (dict): Generation parameters for the model
+        system_instruction (str, optional): System prompt for the model
+
+    Returns:
+        GenerativeModel: The cached model instance
+    """
+    key = (
+        model_name,
+        json.dumps(generation_config, sort_keys=True),
+        hashlib.sha256((system_instruction or "").encode("utf-8")).hexdigest(),
+    )
+    model = _MODELS.get(key)
+    if model is None:
+        genai = _configure_genai()
+        model = genai.GenerativeModel(
+            model_name,
+            generation_config=generation_config,
+            system_instruction=system_instruction,
+        )
+        _MODELS[key] = model
+        _MODEL_KEYS[id(model)] = key
+    return model
+
+
+def _response_cache_path(model, prompt, generation_config=None):
+    """
+    Build the cache file path of a Gemini response.
+
+    The key covers the model name, its generation config and system instruction, the
+    per-request generation config and the prompt, so any change to them is a miss.
+
+    Args:
+        model (GenerativeModel): Model returned by _get_generative_model
+        prompt (str): Prompt text
+        generation_config (dict, optional): Per-request generation parameters
+
+    Returns:
+        str: Path of the cache file inside GEMINI_CACHE_DIR
+    """
+    payload = json.dumps(
+        [_MODEL_KEYS.get(id(model)), generation_config, prompt],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return os.path.join(GEMINI_CACHE_DIR, f"{digest}.json")
+
+
+def load_cached_response(path):
+    """
+    Load a cached Gemini response text if it is younger than GEMINI_CACHE_TTL.
+
+    An expired entry is deleted, as it holds sheet contents that will not be served.
+
+    Args:
+        path (str): Path returned by _response_cache_path
+
+    Returns:
+        str: The cached response text, or None on a miss
+    """
+    try:
+        if time.time() - os.path.getmtime(path) > GEMINI_CACHE_TTL:
+            os.remove(path)
+            return None
+        with open(path, "rb") as f:
+            return _json_loads(f.read())["text"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def prune_response_cache():
+    """
+    Delete the Gemini response cache entries older than GEMINI_CACHE_TTL.
+
+    Entries are only looked up by the exact prompt they answer, so the ones for rows
+    or settings that changed would otherwise stay on disk forever.
+    """
+    cutoff = time.time() - GEMINI_CACHE_TTL
+    try:
+        entries = list(os.scandir(GEMINI_CACHE_DIR))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def save_cached_response(path, text):
+    """
+    Store a Gemini response text in the response cache.
+
+    Args:
+        path (str): Path returned by _response_cache_path
+        text (str): Complete response text
+    """
+    try:
+        os.makedirs(GEMINI_CACHE_DIR, exist_ok=True)
+        access_gsheet_and_save_data.write_atomic(path, _json_dumps({"text": text}))
+    except OSError as e:
+        print(f"Error writing the Gemini response cache: {e}")
+
+
+async def _generate_text(model, prompt, use_cache=True, **kwargs):
+    """
+    Return the text of a Gemini response, served from the response cache when possible.
+
+    Args:
+        model (GenerativeModel): Model returned by _get_generative_model
+        prompt (str): Prompt text
+        use_cache (bool, optional): Look the response up in the cache before sending
+            the request. It is stored in the cache either way.
+        **kwargs: Extra arguments for generate_content_async
+
+    Returns:
+        str: The response text
+    """
+    cache_path = _response_cache_path(model, prompt, kwargs.get("generation_config"))
+    text = load_cached_response(cache_path) if use_cache else None
+    if text is None:
+        response = await _generate_with_backoff(model, prompt, **kwargs)
+        text = response.text
+        save_cached_response(cache_path, text)
+    return text
+
+
+async def _generate_with_backoff(model, prompt, **kwargs):
+    """
+    Send a Gemini request, retrying with exponential backoff on transient errors.
+
+    Rate limiting (429), unavailability, internal errors and deadline overruns are
+    retried up to GEMINI_MAX_RETRIES times; each retry is reported on stderr. With
+    stream=True only the initial request is retried, not a failure mid-stream.
+
+    Args:
+        model (GenerativeModel): Model to send the request to
+        prompt (str): Prompt text
+        **kwargs: Extra arguments for generate_content_async
+
+    Returns:
+        GenerateContentResponse: The model response
+
+    Raises:
+        GoogleAPICallError: If the request still fails after GEMINI_MAX_RETRIES
+        Exception: Any other error from the Gemini API. Failed requests are recorded in
+            FAILED_REQUESTS_LOG before the error is raised.
+    """
+    from google.api_core.exceptions import (
+        DeadlineExceeded,
+        InternalServerError,
+        ResourceExhausted,
+        ServiceUnavailable,
+    )
+
+    retryable = (ResourceExhausted, ServiceUnavailable, InternalServerError, DeadlineExceeded)
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        try:
+            return await model.generate_content_async(prompt, **kwargs)
+        except retryable as e:
+            if attempt == GEMINI_MAX_RETRIES:
+                _log_failed_request(model, prompt, e, attempt + 1)
+                raise
+            delay = _retry_delay(attempt)
+            print(
+                f"\nGemini request failed ({type(e).__name__}), retrying in {delay:.1f}s "
+                f"({attempt + 1}/{GEMINI_MAX_RETRIES})",
+                file=sys.stderr,
+            )
+            await asyncio.sleep(delay)
+        except Exception as e:
+            _log_failed_request(model, prompt, e, attempt + 1)
+            raise
+
+
+def _log_failed_request(model, prompt, error, attempts):
+    """
+    Append a record of a failed Gemini request to FAILED_REQUESTS_LOG.
+
+    Only the prompt size is recorded, not its content, since prompts hold sheet data.
+
+    Args:
+        model (GenerativeModel): Model the request was sent to
+        prompt (str): Prompt text of the request
+        error (Exception): Error raised by the last attempt
+        attempts (int): Number of attempts made
+    """
+    record = {
+        "time": time.time(),
+        "model": getattr(model, "model_name", None),
+        "prompt_chars": len(prompt),
+        "attempts": attempts,
+        "error": f"{type(error).__name__}: {error}",
+    }
+    try:
+        os.makedirs(os.path.dirname(FAILED_REQUESTS_LOG), exist_ok=True)
+        with open(FAILED_REQUESTS_LOG, "ab") as f:
+            f.write(_json_dumps(record) + b"\n")
+    except OSError as e:
+        print(f"Error writing {FAILED_REQUESTS_LOG}: {e}")
+
+
+def _build_format_prompt(rows):
+    """
+    Build the Gemini formatting prompt for a list of rows.
+
+    The rows are sent as a Markdown pipe table, which keeps cells containing commas or
+    line breaks unambiguous. All the instructions live in FORMAT_SYSTEM_INSTRUCTION on
+    the cached model, so the prompt carries nothing but the data.
+
+    Args:
+        rows (list): Rows of marked cell values, the first one being the header
+
+    Returns:
+        str: The prompt text
+    """
+    return "".join(iter_markdown_table_lines(rows))
+
+
+def _estimate_output_tokens(prompt):
+    """
+    Estimate the output token budget needed to format a prompt.
+
+    Args:
+        prompt (str): Formatting prompt sent to Gemini
+
+    Returns:
+        int: max_output_tokens value, clamped to the formatting limits
+    """
+    estimate = int(len(prompt) * FORMAT_OUTPUT_EXPANSION / CHARS_PER_TOKEN)
+    return min(FORMAT_MAX_OUTPUT_TOKENS, max(FORMAT_MIN_OUTPUT_TOKENS, estimate))
+
+
+def _finish_reason(response):
+    """
+    Return the finish reason of a complete Gemini response.
+
+    Args:
+        response (GenerateContentResponse): Response whose stream has been consumed
+
+    Returns:
+        str: Name of the finish reason of the first candidate, or None if unknown
+    """
+    try:
+        reason = response.candidates[0].finish_reason
+    except (AttributeError, IndexError, TypeError):
+        return None
+    return getattr(reason, "name", None) or _FINISH_REASON_NAMES.get(reason)
+
+
+def _row_chars(row):
+    """
+    Approximate the length of a row rendered as a Markdown pipe table line.
+
+    Args:
+        row (list): Cell values of the row
+
+    Returns:
+        int: Number of characters of the rendered line
+    """
+    return sum(map(len, row)) + 3 * len(row) + 2
+
+
+def _chunk_rows(rows, size, max_chars=None):
+    """
+    Split rows into chunks, repeating the header row at the top of each chunk.
+
+    A chunk ends after size data rows, or earlier when one more row would make the
+    rendered chunk, header included, longer than max_chars. A row longer than max_chars
+    on its own still gets a chunk.
+
+    Args:
+        rows (iterable): Sheet rows, the first one being the header
+        size (int): Maximum number of data rows per chunk
+        max_chars (int, optional): Maximum rendered length of a chunk
+
+    Yields:
+        list: Header row followed by up to size data rows
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return
+
+    # The header line is followed by its rule line, of about the same length
+    header_chars = 2 * _row_chars(header)
+    chunk, chars = [header], header_chars
+    for row in rows:
+        row_chars = _row_chars(row)
+        if len(chunk) > size or (
+            max_chars is not None and len(chunk) > 1 and chars + row_chars > max_chars
+        ):
+            yield chunk
+            chunk, chars = [header], header_chars
+        chunk.append(row)
+        chars += row_chars
+    yield chunk
+
+
+def _table_line_format(stripped):
+    """
+    Tell which table format a stripped, non-blank response line belongs to.
+
+    Args:
+        stripped (str): Line without surrounding whitespace
+
+    Returns:
+        str: "pipe" or "box", or None if the line is not part of a table
+    """
+    if stripped.startswith("|"):
+        return "pipe"
+    if stripped[0] in _BOX_TABLE_CHARS:
+        return "box"
+    return None
+
+
+class _TableChunkWriter:
+    """
+    Write one table chunk to a file as Gemini streams it, merging the chunks.
+
+    The chunk may be a box-drawing table, as FORMAT_SYSTEM_INSTRUCTION asks for, or a
+    Markdown pipe table like the prompt; the format is taken from its first line, and
+    every chunk must use the format of the first one. Complete lines are written as
+    soon as they arrive. Every chunk after the first drops its header rows, up to the
+    "╞" line or the pipe table's "|---|" rule. Box chunks after the first are also
+    preceded by a row separator, and every box chunk but the last drops its bottom
+    border. Lines that may still turn out to be part of the header or of the bottom
+    border are held back until that is known. Markdown code fences and any prose before
+    or after the table are dropped. Prose between table lines, a response without a
+    table, or a chunk without a header rule when there are several chunks to merge,
+    raises ValueError rather than ending up in the merged table.
+
+    Attributes:
+        out (TextIO): File the merged table is written to
+        is_last (bool): Whether this is the last chunk, which keeps its bottom border
+        separator (str): First "├" row separator seen in this or a previous chunk
+        table_format (str): "box" or "pipe", once known from this or the first chunk
+        _partial (str): Text received after the last line break
+        _header (list): Lines held while looking for the end of the header, or None
+            once it has been found or the chunk is the first one
+        _header_found (bool): Whether the header rule has been seen
+        _tail (list): Trailing blank or "└" lines that may be the bottom border
+        _started (bool): Whether a table line has been seen yet
+        _single (bool): Whether this chunk is the whole table, which needs no header
+            rule since nothing is merged into it
+        _prose (str): First non-table line seen after the table started, or None
+    """
+
+    def __init__(self, out, is_first, is_last, separator=None, table_format=None):
+        """
+        Initialize the writer for one chunk.
+
+        Args:
+            out (TextIO): File the merged table is written to
+            is_first (bool): Whether this is the first chunk, which keeps its header
+            is_last (bool): Whether this is the last chunk
+            separator (str, optional): Row separator found in the previous chunks
+            table_format (str, optional): Format of the previous chunks
+        """
+        self.out = out
+        self.is_last = is_last
+        self.separator = separator
+        self.table_format = table_format
+        self._partial = ""
+        self._header = None if is_first else []
+        self._header_found = False
+        self._tail = []
+        self._started = False
+        self._single = is_first and is_last
+        self._prose = None
+
+    def feed(self, text):
+        """
+        Write the complete lines of a streamed piece of the response.
+
+        Args:
+            text (str): Next piece of the response text
+
+        Raises:
+            ValueError: If prose is followed by more table lines
+        """
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._add_line(line)
+        self.out.flush()
+
+    def close(self):
+        """
+        Write the rest of the chunk once its response is complete.
+
+        Raises:
+            ValueError: If the response holds no table, or the chunk has no header rule
+                while several chunks are merged
+        """
+        if self._partial:
+            self._add_line(self._partial)
+            self._partial = ""
+        if not self._started:
+            raise ValueError("the response holds no table")
+        if not self._header_found and not self._single:
+            rule = "|---|" if self.table_format == "pipe" else "╞"
+            raise ValueError(f"the formatted table has no header rule ({rule})")
+
+        tail = self._tail
+        while tail and not tail[-1].strip():
+            tail.pop()
+        if not self.is_last:
+            while tail and tail[-1].lstrip().startswith("└"):
+                tail.pop()
+        self._write_lines(tail)
+        tail.clear()
+        self.out.flush()
+
+    def _add_line(self, line):
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            return
+        if stripped:
+            line_format = _table_line_format(stripped)
+            if line_format is None or (self._started and line_format != self.table_format):
+                # Prose before the table is skipped, and so is prose after it as long
+                # as no table line follows
+                if self._started and self._prose is None:
+                    self._prose = stripped
+                return
+            if self._prose is not None:
+                raise ValueError(
+                    f"unexpected line in the formatted table: {self._prose[:60]!r}"
+                )
+            if not self._started:
+                self._started = True
+                self._check_format(line_format)
+        elif not self._started or self._prose is not None:
+            return
+        if self.table_format == "pipe":
+            if not self._header_found and _PIPE_RULE_PATTERN.fullmatch(stripped):
+                self._header_found = True
+        elif stripped.startswith("╞"):
+            self._header_found = True
+        if self._header is not None:
+            self._header.append(line)
+            if self._header_found:
+                self._header = None
+                self._start_body()
+            return
+        self._add_body_line(line)
+
+    def _check_format(self, table_format):
+        if self.table_format is None:
+            self.table_format = table_format
+        elif table_format != self.table_format:
+            raise ValueError(
+                f"the chunk is a {table_format} table, the previous ones a "
+                f"{self.table_format} table"
+            )
+
+    def _start_body(self):
+        if self.separator:
+            self.out.write(self.separator + "\n")
+
+    def _add_body_line(self, line):
+        stripped = line.lstrip()
+        pipe = self.table_format == "pipe"
+        if self.separator is None and not pipe and stripped.startswith("├"):
+            self.separator = line
+        if not stripped or (not pipe and stripped.startswith("└")):
+            self._tail.append(line)
+            return
+        self._write_lines(self._tail)
+        self._tail.clear()
+        self.out.write(line + "\n")
+
+    def _write_lines(self, lines):
+        for line in lines:
+            self.out.write(line + "\n")
+
+
+def iter_markdown_table_lines(data):
+    """
+    Render spreadsheet rows as the lines of a Markdown pipe table without calling Gemini.
+
+    The first row is used as the header. Short rows are padded to the widest row, pipes
+    are escaped and line breaks become <br> so every row stays on one line. Lines are
+    produced one at a time so they can be streamed to the output file. Ledger-style
+    sheets repeat the same row in runs, so a row equal to the previous one reuses its
+    line; only that one line is kept, so memory stays flat however large the sheet is.
+
+    Args:
+        data (list): The spreadsheet rows, already marked, the first one being the header
+
+    Yields:
+        str: One table line, newline included
+    """
+    width = max(map(len, data), default=0)
+    if not width:
+        return
+
+    previous_row = line = None
+    for i, row in enumerate(data):
+        if row != previous_row:
+            cells = [cell.translate(_TABLE_CELL_ESCAPES) for cell in row]
+            cells += [""] * (width - len(cells))
+            line = f"| {' | '.join(cells)} |\n"
+            previous_row = row
+        yield line
+        if i == 0:
+            yield f"|{'---|' * width}\n"
+
+
+def _is_small_sheet(data):
+    """
+    Check whether a sheet is small enough to skip Gemini formatting.
+
+    Args:
+        data (list): The spreadsheet rows
+
+    Returns:
+        bool: True if the sheet has at most LOCAL_RENDER_MAX_ROWS rows and fewer than
+            LOCAL_RENDER_MAX_CHARS characters in its cells
+    """
+    if len(data) > LOCAL_RENDER_MAX_ROWS:
+        return False
+    chars = 0
+    for row in data:
+        chars += sum(map(len, row))
+        if chars >= LOCAL_RENDER_MAX_CHARS:
+            return False
+    return True
+
+
+async def format_with_gemini(data, progress=None, semaphore=None, out=None, use_cache=True):
+    """
+    Use Gemini AI to format data into a readable and organized markdown structure.
+
+    Large sheets are split into chunks of at most FORMAT_CHUNK_ROWS rows and
+    FORMAT_CHUNK_CHARS characters, each with the header row repeated, which are
+    formatted concurrently (at most GEMINI_MAX_CONCURRENCY at a time). Every response
+    is streamed, and the chunks are merged into one table and written to out in order
+    as their text arrives, so the first rows reach the file before the whole table has
+    been generated. A chunk is only started once it is at most GEMINI_MAX_CONCURRENCY
+    chunks ahead of the one being written, so a slow chunk holds back a bounded number
+    of buffered responses rather than the rest of the sheet. A response cut off at max_output_tokens fails the formatting
+    instead of leaving rows out. Chunks whose prompt was already formatted are served
+    from the Gemini response cache, which only stores complete, merged chunks.
+
+    Args:
+        data (iterable): The spreadsheet rows to be formatted, consumed once
+        progress (ProgressBar, optional): Progress tracking instance. Pass None when
+            another concurrent step owns the progress bar.
+        semaphore (asyncio.Semaphore, optional): Limit on in-flight Gemini requests,
+            shared when several sheets are formatted at once
+        out (TextIO, optional): File the table is written to while it streams in. When
+            omitted the table is collected and returned.
+        use_cache (bool, optional): Reuse cached responses for unchanged chunks
+
+    Returns:
+        str: Formatted markdown text, when out is None
+        bool: True once the table has been written to out
+        None: If an error occurs during formatting, including a chunk that is not a
+            well-formed table. Part of the table may already have been written to out.
+
+    Raises:
+        Exception: If Gemini API encounters an error
+    """
+    buffer = io.StringIO() if out is None else None
+    pending = collections.deque()
+    try:
+        if progress:
+            await progress.simulate_progress(
+                "Formatting data with Gemini...", start_from=10, until=90
+            )
+
+        model = _get_generative_model(
+            "gemini-2.0-flash",
+            generation_config={
+                "temperature": 0.3,
+                "top_p": 0.9,
+                "top_k": 40,
+            },
+            system_instruction=FORMAT_SYSTEM_INSTRUCTION,
+        )
+
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+        async def format_chunk(rows, queue):
+            # Returns the cache entry to store once the chunk has been merged, or None
+            try:
+                prompt = _build_format_prompt(rows)
+                max_tokens = _estimate_output_tokens(prompt)
+                generation_config = {"max_output_tokens": max_tokens}
+                cache_path = _response_cache_path(model, prompt, generation_config)
+                text = load_cached_response(cache_path) if use_cache else None
+                if text is not None:
+                    queue.put_nowait(text)
+                    return None
+
+                async with semaphore:
+                    response = await _generate_with_backoff(
+                        model, prompt, stream=True, generation_config=generation_config
+                    )
+                    pieces = []
+                    async for piece in response:
+                        pieces.append(piece.text)
+                        queue.put_nowait(pieces[-1])
+                if _finish_reason(response) == "MAX_TOKENS":
+                    error = ValueError(
+                        f"the response was cut off at {max_tokens} output tokens"
+                    )
+                    _log_failed_request(model, prompt, error, 1)
+                    raise error
+                return cache_path, "".join(pieces)
+            finally:
+                queue.put_nowait(None)
+
+        chunks = _chunk_rows(data, FORMAT_CHUNK_ROWS, FORMAT_CHUNK_CHARS)
+
+        def start_next_chunk():
+            rows = next(chunks, None)
+            if rows is not None:
+                queue = asyncio.Queue()
+                pending.append((queue, asyncio.ensure_future(format_chunk(rows, queue))))
+
+        for _ in range(GEMINI_MAX_CONCURRENCY):
+            start_next_chunk()
+
+        # Chunks are written in order; the ones started ahead are buffered in their
+        # queues until the ones before them are complete
+        target = buffer if out is None else out
+        separator = table_format = None
+        i = 0
+        while pending:
+            queue, task = pending[0]
+            start_next_chunk()
+            writer = _TableChunkWriter(
+                target, i == 0, len(pending) == 1, separator, table_format
+            )
+            try:
+                while (piece := await queue.get()) is not None:
+                    writer.feed(piece)
+                cache_entry = await task
+                writer.close()
+            except ValueError as e:
+                raise ValueError(f"chunk {i + 1}: {e}") from e
+            pending.popleft()
+            separator, table_format = writer.separator, writer.table_format
+            if cache_entry:
+                save_cached_response(*cache_entry)
+            i += 1
+
+        if progress:
+            progress.update("Formatting data with Gemini", 100)
+            await progress.wait_for_fake_progress()
+        return buffer.getvalue() if out is None else True
+
+    except Exception as e:
+        print(f"Error formatting data with Gemini: {e}")
+        return None
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+
+def authenticate_google(progress):
+    """
+    Authenticate with Google Sheets API using OAuth2.
+
+    The credentials are shared with access_gsheet_and_save_data: the ones it already
+    loaded in this process are reused without further progress updates, otherwise
+    get_credentials() reads, refreshes or creates them in its token database.
+
+    Args:
+        progress (ProgressBar): Progress tracking instance
+
+    Returns:
+        Credentials: Valid Google OAuth2 credentials
+
+    Raises:
+        Exception: If authentication fails or credentials cannot be obtained
+    """
+    try:
+        creds = access_gsheet_and_save_data.get_cached_credentials()
+        if not creds:
+            progress.update("Authenticating with Google", 50)
+            creds = access_gsheet_and_save_data.get_credentials()
+        progress.update("Authenticating with Google", 100)
+        return creds
+
+    except Exception as e:
+        progress.update("Authentication error", 100)
+        raise Exception(f"Google authentication error: {str(e)}")
+
+
+def _slugify(data, sheet_title=""):
+    """
+    Build a markdown filename locally from the sheet title and header row.
+
+    Args:
+        data (list): Spreadsheet data, the first row being the header
+        sheet_title (str): Name of the worksheet
+
+    Returns:
+        str: Filename with .md extension, or None if no usable slug can be built
+    """
+    header = data[0] if data else []
+    text = " ".join([sheet_title, *header])
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    slug = _SLUG_PATTERN.sub("_", text.lower())[:47].strip("_")
+
+    if not slug or slug.replace("_", "").isdigit():
+        return None
+    return f"{slug}.md"
+
+
+async def generate_file_name_with_ai(
+    data, progress=None, sheet_title="", use_ai_naming=False, use_cache=True
+):
+    """
+    Generate a markdown filename based on spreadsheet content.
+
+    The filename is built locally from the sheet title and header row. Gemini is only
+    asked for a name when use_ai_naming is set or no usable local name can be built.
+    The rows are the marked ones written to the table, so the name is based on the same
+    text as the output; the markup itself is dropped by the slugger like any symbol.
+
+    Args:
+        data (list): Marked spreadsheet rows to base the filename on
+        progress (ProgressBar, optional): Progress tracking instance. Pass None when
+            running concurrently with another step that owns the progress bar.
+        sheet_title (str, optional): Name of the worksheet, used by the local slugger
+        use_ai_naming (bool, optional): Always ask Gemini for the filename
+        use_cache (bool, optional): Reuse a cached Gemini answer for the same data
+
+    Returns:
+        str: Generated filename with .md extension
+        str: 'output.md' if an error occurs
+
+    Note:
+        The generated filename will be lowercase, use underscores,
+        and contain only alphanumeric characters.
+    """
+    if not use_ai_naming:
+        file_name = _slugify(data, sheet_title)
+        if file_name:
+            return file_name
+
+    try:
+        if progress:
+            await progress.simulate_progress(
+                "Generating file name...", start_from=0, until=90
+            )
+
+        model = _get_generative_model(
+            "gemini-1.5-pro",
+            generation_config={
+                "max_output_tokens": 100,
+                "temperature": 0.5,
+                "top_p": 0.95,
+            },
+        )
+
+        sample_data = str(data[:3]) if len(data) > 3 else str(data)
+
+        prompt = f"""
+        Generate a simple markdown filename based on this spreadsheet data:
+        {sample_data}
+
+        Requirements:
+        - Use only lowercase letters, numbers and underscores
+        - Must end with .md
+        - Maximum 50 characters
+        - No special characters
+        - No spaces
+        """
+
+        file_name = (await _generate_text(model, prompt, use_cache)).strip().lower()
+
+        if not file_name.endswith(".md"):
+            file_name += ".md"
+
+        file_name = file_name.translate(_FILE_NAME_CHARS)
+
+        if progress:
+            progress.update("Generating filename", 100)
+            await progress.wait_for_fake_progress()
+
+        return file_name
+
+    except Exception as e:
+        if progress:
+            progress.update("Error generating filename", 100)
+        print(f"\nError generating filename: {e}")
+        return "output.md"
+
+
+def _mark_cell(cell):
+    """
+    Apply the Markdown identifier formatting to a single cell.
+
+    Most cells hold neither a formula nor dropdown options, so a single precompiled
+    search decides between the checkbox lookup and the slower formula/options path.
+    The checkbox lookup is a length check followed by one dict lookup.
+
+    Args:
+        cell (str): Raw cell value
+
+    Returns:
+        str: Cell value with special elements marked in Markdown format
+    """
+    if _MARKER_PATTERN.search(cell) is None:
+        if len(cell) > _CHECKBOX_MAX_LEN:
+            return cell
+        return _CHECKBOX.get(cell.upper(), cell)
+
+    if "[formula:" in cell:
+        cell = f"`{cell}`"
+
+    index = cell.find(_OPTIONS_SEPARATOR)
+    if index >= 0:
+        start = index + len(_OPTIONS_SEPARATOR)
+        end = cell.find(_OPTIONS_SEPARATOR, start)
+        options = cell[start:end] if end >= 0 else cell[start:]
+        cell = f"{cell[:index]} <select>{options.rstrip(']')}</select>"
+
+    return cell
+
+
+def parse_args(argv=None):
+    """
+    Parse the command line options of the converter.
+
+    Unknown options are ignored so the converter can share a command line with
+    access_gsheet_and_save_data.py when both run through run.py.
+
+    Args:
+        argv (list, optional): Arguments to parse. Defaults to sys.argv[1:].
+
+    Returns:
+        argparse.Namespace: The parsed options with no_cache, no_formulas and
+            no_gemini.
+    """
+    parser = argparse.ArgumentParser(
+        description="Convert the selected worksheet to a markdown table."
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=os.getenv("NO_CACHE") == "1",
+        help="fetch and convert the sheet even if it is unchanged (env: NO_CACHE=1)",
+    )
+    parser.add_argument(
+        "--no-formulas",
+        action="store_true",
+        default=os.getenv("NO_FORMULAS") == "1",
+        help="fetch display values only, without formulas or dropdown options "
+        "(env: NO_FORMULAS=1)",
+    )
+    parser.add_argument(
+        "--no-gemini",
+        action="store_true",
+        default=os.getenv("NO_GEMINI") == "1",
+        help="render a plain markdown table locally instead of formatting it with "
+        "Gemini (env: NO_GEMINI=1)",
+    )
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+def _claim_output_path(path, spreadsheet_id, sheet_title):
+    """
+    Record that an output path belongs to a worksheet, unless another one has it.
+
+    Args:
+        path (str): Path of the file in the output directory
+        spreadsheet_id (str): Target spreadsheet identifier
+        sheet_title (str): Name of the worksheet
+
+    Returns:
+        bool: True if the path is now owned by this worksheet
+    """
+    owner = (spreadsheet_id, sheet_title)
+    return _OUTPUT_OWNERS.setdefault(path, owner) == owner
+
+
+def _output_path(file_name, spreadsheet_id, sheet_title):
+    """
+    Build the output path for a generated markdown filename.
+
+    The filename is used as is, unless another worksheet already wrote or kept that
+    path during this run, since the local slug and the Gemini name can be the same for
+    different worksheets. The name is then suffixed with a short hash of the spreadsheet
+    ID and worksheet title.
+
+    Args:
+        file_name (str): Filename returned by generate_file_name_with_ai
+        spreadsheet_id (str): Target spreadsheet identifier
+        sheet_title (str): Name of the worksheet
+
+    Returns:
+        str: Path of the file in the output directory
+    """
+    file_name = file_name.strip().replace(" ", "_")
+    path = f"output/{file_name}"
+    if not _claim_output_path(path, spreadsheet_id, sheet_title):
+        stem, extension = os.path.splitext(file_name)
+        suffix = hashlib.sha256(f"{spreadsheet_id}/{sheet_title}".encode()).hexdigest()
+        path = f"output/{stem}_{suffix[:OUTPUT_SUFFIX_LENGTH]}{extension or '.md'}"
+        _claim_output_path(path, spreadsheet_id, sheet_title)
+    return path
+
+
+async def save_sheet_as_markdown(
+    spreadsheet_id,
+    sheet_title,
+    modified_time,
+    sheet_data,
+    progress=None,
+    semaphore=None,
+    need_formulas=True,
+    use_gemini=True,
+    use_cache=True,
+):
+    """
+    Format one worksheet and write it to the output directory.
+
+    Args:
+        spreadsheet_id (str): Target spreadsheet identifier
+        sheet_title (str): Name of the worksheet
+        modified_time (str): Drive modifiedTime the data corresponds to
+        sheet_data (list): Formatted sheet data, already marked by get_sheet_data
+        progress (ProgressBar, optional): Progress tracking instance
+        semaphore (asyncio.Semaphore, optional): Limit on in-flight Gemini requests
+        need_formulas (bool, optional): Whether sheet_data includes formulas and
+            dropdown options, recorded with the output
+        use_gemini (bool, optional): Format the table with Gemini, writing it as the
+            response streams in. When False, when the sheet is small enough for
+            _is_small_sheet, or when the Gemini formatting fails, a plain Markdown table
+            is rendered locally and streamed to the file line by line.
+        use_cache (bool, optional): Reuse cached Gemini responses
+    """
+    naming = generate_file_name_with_ai(
+        sheet_data[:3],
+        sheet_title=sheet_title,
+        use_ai_naming=os.getenv("USE_AI_NAMING") == "1",
+        use_cache=use_cache,
+    )
+    output_path = None
+    if use_gemini and not _is_small_sheet(sheet_data):
+        # The table streams into a temporary file while the filename, which only needs
+        # the first rows, is generated; the file is moved into place once both are done.
+        # Like write_atomic() it is opened normally, so it gets the umask's permissions,
+        # and named after the process and worksheet, which are formatted concurrently.
+        sheet_key = hashlib.sha256(f"{spreadsheet_id}/{sheet_title}".encode()).hexdigest()
+        tmp_path = os.path.join("output", f".{sheet_key[:16]}.md.tmp-{os.getpid()}")
+        out = open(tmp_path, "w", encoding="utf-8")
+        try:
+            with out:
+                formatted, file_name = await asyncio.gather(
+                    format_with_gemini(sheet_data, progress, semaphore, out, use_cache),
+                    naming,
+                )
+                if formatted is not None:
+                    access_gsheet_and_save_data.sync_file(out)
+            if formatted is not None:
+                output_path = _output_path(file_name, spreadsheet_id, sheet_title)
+                os.replace(tmp_path, output_path)
+                tmp_path = None
+        finally:
+            if tmp_path:
+                os.remove(tmp_path)
+        if output_path is None:
+            print(f"\nWriting worksheet '{sheet_title}' as a plain Markdown table instead.")
+            # Recorded as a local render, so the next run formats it with Gemini again
+            use_gemini = False
+    else:
+        file_name = await naming
+
+    if output_path is None:
+        lines = iter_markdown_table_lines(sheet_data)
+        output_path = _output_path(file_name, spreadsheet_id, sheet_title)
+        access_gsheet_and_save_data.write_lines_atomic(output_path, lines)
+
+    # The requested mode is recorded: the small sheet check gives the same answer for
+    # the same data, so the output stays valid for the next run in that mode
+    save_cached_output(
+        spreadsheet_id, sheet_title, modified_time, output_path, need_formulas, use_gemini
+    )
+
+
+async def convert_spreadsheet(
+    http, service, creds, sheet_metadata, progress, semaphore, use_cache, need_formulas, use_gemini
+):
+    """
+    Convert the selected worksheets of one spreadsheet to markdown files.
+
+    Args:
+        http (AuthorizedHttp): Authorized HTTP client shared by the API services
+        service: Google Sheets API service instance
+        creds (Credentials): Valid Google OAuth2 credentials
+        sheet_metadata (dict): Spreadsheet ID and the list of worksheet titles
+        progress (ProgressBar): Progress tracking instance
+        semaphore (asyncio.Semaphore): Limit shared by every Gemini request
+        use_cache (bool): Reuse the cached output, sheet data and Gemini responses
+        need_formulas (bool): Include formulas and dropdown options in the output
+        use_gemini (bool): Format the tables with Gemini
+
+    Raises:
+        Exception: If any step in the process fails
+    """
+    spreadsheet_id = sheet_metadata["spreadsheet_id"]
+
+    modified_time = get_modified_time(http, spreadsheet_id)
+    sheet_titles = []
+    for sheet_title in sheet_metadata["sheet_titles"]:
+        output_path = None
+        if use_cache:
+            output_path = load_cached_output(
+                spreadsheet_id, sheet_title, modified_time, need_formulas, use_gemini
+            )
+        if output_path and not _claim_output_path(output_path, spreadsheet_id, sheet_title):
+            # Another worksheet of this run already wrote to that path
+            output_path = None
+        if output_path:
+            print(f"\nSpreadsheet unchanged since the last run, keeping {output_path}")
+        else:
+            sheet_titles.append(sheet_title)
+
+    sheet_data_by_title = {}
+    missing_titles = []
+    for sheet_title in sheet_titles:
+        sheet_data = None
+        if use_cache:
+            sheet_data = load_cached_sheet_data(
+                spreadsheet_id, sheet_title, modified_time, need_formulas
+            )
+        if sheet_data is None:
+            missing_titles.append(sheet_title)
+        else:
+            sheet_data_by_title[sheet_title] = sheet_data
+
+    if missing_titles:
+        session = build_authorized_session(creds) if need_formulas else None
+        fetched = await get_sheet_data(
+            service,
+            spreadsheet_id,
+            missing_titles,
+            progress,
+            session,
+            need_formulas=need_formulas,
+        )
+        for sheet_title, sheet_data in (fetched or {}).items():
+            if sheet_data:
+                save_cached_sheet_data(
+                    spreadsheet_id, sheet_title, modified_time, sheet_data, need_formulas
+                )
+            sheet_data_by_title[sheet_title] = sheet_data
+
+    conversions = []
+    for sheet_title in sheet_titles:
+        sheet_data = sheet_data_by_title.get(sheet_title)
+        if not sheet_data:
+            print(f"No data was retrieved from worksheet '{sheet_title}'.")
+            continue
+        conversions.append((sheet_title, sheet_data))
+
+    # Worksheets are formatted concurrently under one shared Gemini request limit.
+    # Only the first one drives the progress bar.
+    await asyncio.gather(
+        *(
+            save_sheet_as_markdown(
+                spreadsheet_id,
+                sheet_title,
+                modified_time,
+                sheet_data,
+                progress if i == 0 else None,
+                semaphore,
+                need_formulas,
+                use_gemini,
+                use_cache,
+            )
+            for i, (sheet_title, sheet_data) in enumerate(conversions)
+        )
+    )
+
+
+async def main_async(use_cache=True, need_formulas=True, use_gemini=True):
+    """
+    Main function that orchestrates the sheet-to-markdown conversion process.
+
+    This function:
+    1. Initializes progress tracking
+    2. Authenticates with Google Sheets
+    3. Retrieves and processes sheet data
+    4. Formats data using AI
+    5. Generates appropriate filename
+    6. Saves the formatted markdown output
+
+    When json/sheet_info.json lists several spreadsheets, they are converted one after
+    the other with the same credentials and API service.
+
+    Args:
+        use_cache (bool, optional): Reuse the cached output, sheet data and Gemini
+            responses when they are unchanged. The caches are refreshed either way.
+        need_formulas (bool, optional): Include formulas and dropdown options in the
+            output. When False the sheet is fetched with a single values.batchGet.
+        use_gemini (bool, optional): Format the tables with Gemini. When False they
+            are rendered locally and no formatting request is sent.
+
+    Raises:
+        Exception: If any step in the process fails
+    """
+    progress = ProgressBar()
+
+    try:
+        os.makedirs("output", exist_ok=True)
+        prune_response_cache()
+
+        # Authentication may refresh the token over the network, so the metadata file
+        # is read while it runs; only authentication reports progress
+        creds, spreadsheets = await asyncio.gather(
+            asyncio.to_thread(authenticate_google, progress),
+            get_sheet_metadata(),
+        )
+        http = build_authorized_http(creds)
+        service = build_service("sheets", "v4", http)
+
+        semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        for sheet_metadata in spreadsheets:
+            await convert_spreadsheet(
+                http,
+                service,
+                creds,
+                sheet_metadata,
+                progress,
+                semaphore,
+                use_cache,
+                need_formulas,
+                use_gemini,
+            )
+
+    except Exception as e:
+        print(f"\nError during script execution: {e}")
+    finally:
+        await progress.wait_for_fake_progress()
+
+
+def main(argv=None):
+    """
+    Run the sheet-to-markdown conversion on a new asyncio event loop.
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to sys.argv[1:].
+    """
+    args = parse_args(argv)
+    asyncio.run(
+        main_async(
+            use_cache=not args.no_cache,
+            need_formulas=not args.no_formulas,
+            use_gemini=not args.no_gemini,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()